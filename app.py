@@ -1,41 +1,293 @@
-from flask import Flask, request, jsonify, render_template, Response
+from flask import Flask, request, jsonify, render_template, Response, url_for
 from flask_cors import CORS
 import os
 import speech_recognition as sr
-from pydub import AudioSegment
+import numpy as np
 import json
 import time
 import yt_dlp
 import re
 import subprocess
 import sys
+import uuid
+import threading
+import importlib.metadata
+import copy
+import hashlib
+import itertools
+import queue
+import functools
+import zlib
+from contextlib import contextmanager
+from collections import deque
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from transcript_cache import TranscriptCache
+from search_index import SearchIndex, parse_segment_time
+from jobs import JobManager, SharedEvents, FINISHED_STATES, in_job_worker
+from checkpoints import CheckpointStore
+from scheduler import RecognizerScheduler, SharedTokenBucket
+import recognizers
+import metrics
 
-# Auto-update yt-dlp on startup
+# yt-dlp updates are opt-in and never block startup:
+#   python app.py --update-ytdlp      update once and exit
+#   YTDLP_AUTO_UPDATE=1 python app.py  update in a background thread
 def update_ytdlp():
     try:
         print("🔄 Checking for yt-dlp updates...")
         subprocess.check_call([sys.executable, "-m", "pip", "install", "--upgrade", "yt-dlp"])
-        print("✅ yt-dlp updated successfully!")
+        print("✅ yt-dlp updated successfully! Restart the server to load it.")
     except Exception as e:
         print(f"⚠️ Could not update yt-dlp: {e}")
 
-# Run update on startup
-update_ytdlp()
+def start_ytdlp_updater():
+    """Run update_ytdlp() in a daemon thread so the server starts immediately"""
+    thread = threading.Thread(target=update_ytdlp, name='ytdlp-updater', daemon=True)
+    thread.start()
+    return thread
+
+def installed_ytdlp_version():
+    """Version of yt-dlp currently installed on disk (may be newer than the loaded one)"""
+    try:
+        return importlib.metadata.version('yt-dlp')
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
 app = Flask(__name__)
 CORS(app)
 
 UPLOAD_FOLDER = 'uploads'
+UPLOAD_BLOCK_BYTES = 256 * 1024  # Read size when streaming a request body into ffmpeg or to disk
+# Containers whose index may sit at the end of the file; ffmpeg needs to seek, so these are spooled to disk
+SEEKABLE_UPLOAD_FORMATS = ['.mp4', '.mov', '.m4a', '.m4v', '.3gp']
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
+# Speech-to-text chunk pool
+RECOGNIZER_WORKERS = int(os.environ.get('RECOGNIZER_WORKERS', 4))  # Recognizer threads per request; the scheduler caps the process-wide total
+RECOGNIZER_RETRIES = 3      # Retries per chunk on API errors
+RECOGNIZER_BACKOFF = 1.0    # Upper bound of the first (jittered) retry delay, doubled on each attempt
+# Shared by all requests in the process, see scheduler.RecognizerScheduler
+RECOGNIZER_RATE = float(os.environ.get('RECOGNIZER_RATE', 5))                     # Calls per second
+RECOGNIZER_BURST = int(os.environ.get('RECOGNIZER_BURST', 10))                    # Token bucket size
+RECOGNIZER_MAX_CONCURRENCY = int(os.environ.get('RECOGNIZER_MAX_CONCURRENCY', 16))
+RECOGNIZER_FAILURE_THRESHOLD = 5   # Consecutive API errors that open the circuit breaker
+RECOGNIZER_COOLDOWN = float(os.environ.get('RECOGNIZER_COOLDOWN', 30))          # Seconds before trying again
+RECOGNIZER_ENGINE = os.environ.get('RECOGNIZER_ENGINE', 'google')   # Default backend, see recognizers.BACKENDS
+LOCAL_RECOGNIZER_WORKERS = int(os.environ.get('LOCAL_RECOGNIZER_WORKERS', 0)) or os.cpu_count() or 1
+_local_recognizer_pool = None  # Shared process pool for CPU backends, created on first use
+_local_recognizer_lock = threading.Lock()
+CHUNK_SECONDS = 30          # Longest audio region sent to the recognizer
+RECOGNIZER_SAMPLE_RATE = 16000  # Audio is decoded once, straight to 16 kHz mono 16-bit PCM
+
+# Energy-based speech detection: only speech regions are recognized
+VAD_FRAME_MS = 30               # Analysis frame length
+VAD_ENERGY_THRESHOLD = 300      # Lowest frame RMS (16-bit scale, like Recognizer.energy_threshold) counted as speech
+VAD_MAX_ENERGY_THRESHOLD = 1500 # Calibration never raises the threshold above this, so quiet speakers survive
+VAD_CALIBRATION_SECONDS = 10.0  # Opening stretch of each file used to measure the noise floor
+VAD_NOISE_PERCENTILE = 10       # Frame RMS percentile taken as the noise floor
+VAD_NOISE_RATIO = 2.0           # Speech must be this many times louder than the noise floor
+VAD_MIN_SILENCE = 0.5           # Seconds of quiet needed to end a region
+VAD_MIN_SPEECH = 0.25           # Regions shorter than this are dropped as clicks/noise
+VAD_SPLIT_SEARCH = 5.0          # Regions over CHUNK_SECONDS are split at the quietest frame in this last stretch
+
+# Pipelined mode: ffmpeg reads the selected audio format straight from YouTube, so
+# recognition starts while the rest is still downloading. Set to 0 to download first.
+PIPELINE_DOWNLOADS = os.environ.get('PIPELINE_DOWNLOADS', '1') != '0'
+PIPELINE_PROTOCOLS = ('http', 'https', 'm3u8', 'm3u8_native')  # Formats ffmpeg can read directly
+
+# yt-dlp option profiles. Outputs are named by video ID so the same options
+# (and pooled YoutubeDL instances) serve every request; audio downloads are
+# renamed per run.
+YDL_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36'
+YDL_BASE_OPTS = {
+    'outtmpl': os.path.join(UPLOAD_FOLDER, '%(id)s'),
+    'quiet': True,
+    'no_warnings': True,
+    'nocheckcertificate': True,
+    'user_agent': YDL_USER_AGENT,
+    'extractor_args': {
+        'youtube': {
+            'player_client': ['android', 'web', 'ios'],
+            'skip': ['dash', 'hls']
+        }
+    },
+    'http_headers': {
+        'User-Agent': YDL_USER_AGENT,
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'en-us,en;q=0.5',
+        'Sec-Fetch-Mode': 'navigate',
+        'Referer': 'https://www.youtube.com/',
+    },
+    'cookiefile': None,
+    'age_limit': None,
+}
+YDL_PROFILES = {
+    'metadata': dict(YDL_BASE_OPTS, **{
+        'skip_download': True,
+    }),
+    'playlist': dict(YDL_BASE_OPTS, **{
+        'skip_download': True,
+        'extract_flat': 'in_playlist',
+    }),
+    'audio': dict(YDL_BASE_OPTS, **{
+        # Kept in its original container, ffmpeg decodes it straight to recognizer PCM
+        'format': 'bestaudio/best',
+    }),
+}
+YDL_POOL_SIZE = 4  # Idle YoutubeDL instances kept per profile
+_ydl_pools = {profile: queue.LifoQueue() for profile in YDL_PROFILES}
+
+@contextmanager
+def pooled_ydl(profile):
+    """Borrow a YoutubeDL instance for a profile, reusing its HTTP session across requests"""
+    pool = _ydl_pools[profile]
+    try:
+        ydl = pool.get_nowait()
+    except queue.Empty:
+        ydl = yt_dlp.YoutubeDL(YDL_PROFILES[profile])
+    
+    try:
+        yield ydl
+    except BaseException:
+        # Don't hand a possibly half-used instance to the next request
+        ydl.close()
+        raise
+    
+    if pool.qsize() < YDL_POOL_SIZE:
+        pool.put(ydl)
+    else:
+        ydl.close()
+
+# Caption tracks are fetched into memory on a shared, bounded pool
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 4))                    # Videos processed at once per batch
+CAPTION_FETCH_WORKERS = int(os.environ.get('CAPTION_FETCH_WORKERS', 8))    # Concurrent caption downloads, all requests
+caption_fetch_pool = ThreadPoolExecutor(max_workers=CAPTION_FETCH_WORKERS)
+
+# Finished transcripts, keyed by video ID + language + source (captions/audio)
+CACHE_FOLDER = 'cache'
+TRANSCRIPT_LANGUAGE = 'en'  # Default language; 'en' also matches en-US, en-GB, ...
+transcript_cache = TranscriptCache(
+    os.path.join(CACHE_FOLDER, 'transcripts.db'),
+    ttl_seconds=int(os.environ.get('TRANSCRIPT_CACHE_TTL', 7 * 24 * 3600)),
+    max_bytes=int(os.environ.get('TRANSCRIPT_CACHE_MAX_MB', 200)) * 1024 * 1024
+)
+
+# Every finished video transcript is also indexed for /search; the index doesn't expire like the cache
+search_index = SearchIndex(os.path.join(CACHE_FOLDER, 'search.db'))
+SEARCH_MAX_RESULTS = 100
+
+# Background jobs run in worker processes and outlive the submitting request
+JOBS_FOLDER = 'jobs'
+JOB_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+METRICS_FOLDER = os.path.join(JOBS_FOLDER, '_metrics')  # Job worker totals merged into /metrics
+job_manager = JobManager(JOBS_FOLDER, workers=int(os.environ.get('JOB_WORKERS', 0)) or None,
+                         metrics_folder=METRICS_FOLDER)
+
+# Uploads are stored and cached by content hash; identical uploads in flight share one run
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+shared_uploads = SharedEvents()
+upload_jobs = {}  # (sha256, engine) -> ID of the latest background job for that content
+upload_jobs_lock = threading.Lock()
+
+# Finished chunks (and downloaded audio) of interrupted runs, so a retry resumes where it stopped
+CHECKPOINT_FOLDER = 'checkpoints'
+checkpoints = CheckpointStore(
+    CHECKPOINT_FOLDER,
+    retention_seconds=int(os.environ.get('CHECKPOINT_RETENTION', 7 * 24 * 3600))
+)
+
+# Compact event streams (?compact=1): partial results are sent in batches, and the final
+# event marks completion instead of repeating the transcript
+SSE_FLUSH_INTERVAL = float(os.environ.get('SSE_FLUSH_INTERVAL', 0.25))  # Seconds a batch collects events
+SSE_COMPRESSION_LEVEL = 6
+SSE_ENCODINGS = ('gzip', 'deflate')  # Offered to compact streams, in order of preference
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.route('/health')
+def health():
+    return jsonify({
+        'status': 'ok',
+        'yt_dlp_version': yt_dlp.version.__version__,
+        'yt_dlp_installed_version': installed_ytdlp_version(),
+        'recognizer_engine': RECOGNIZER_ENGINE,
+        'recognizer_engines': recognizers.available_backends(),
+        'recognizer_schedulers': {name: s.state() for name, s in recognizer_schedulers.items()}
+    })
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text format: stage timings, recognizer latency, chunk/byte/cache/error counters"""
+    return Response(metrics.render(METRICS_FOLDER), mimetype='text/plain; version=0.0.4')
+
+@app.route('/search')
+def search():
+    """Find phrases in every indexed transcript: ?q=...&limit=20&language=en&video_id=..."""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'No query provided'}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), SEARCH_MAX_RESULTS)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    
+    start = time.perf_counter()
+    with metrics.span('search'):
+        results = search_index.search(query, limit=limit, language=request.args.get('language'),
+                                      video_id=request.args.get('video_id'))
+    for result in results:
+        result['url'] = f"https://www.youtube.com/watch?v={result['video_id']}&t={int(result['seconds'])}s"
+    return jsonify({
+        'query': query,
+        'results': results,
+        'took_ms': round((time.perf_counter() - start) * 1000, 1)
+    })
+
+def request_flag(name, data=None):
+    """True when a boolean option is set in the query string, the JSON body or a form field"""
+    value = request.args.get(name)
+    if value is None and data:
+        value = data.get(name)
+    if value is None:
+        value = request.form.get(name)
+    return str(value).lower() in ('1', 'true', 'yes')
+
+def is_fast_mode(data=None):
+    """True when the client asked to pace the display itself (?fast=1, "fast": true or a fast form field)"""
+    return request_flag('fast', data)
+
+def requested_engine(data=None):
+    """Recognizer backend for this request (?engine=, "engine" or an engine form field), else RECOGNIZER_ENGINE"""
+    return (request.args.get('engine') or (data or {}).get('engine')
+            or request.form.get('engine') or RECOGNIZER_ENGINE)
+
+class Pause(float):
+    """A generator's display pause in seconds, handed over by run_events(pace=True) instead of slept"""
+
+_paced_events = threading.local()  # put() of the run_events(pace=True) call on this thread
+
+def make_pause(fast):
+    """Return the delay function for an SSE generator; a no-op in fast mode"""
+    if fast:
+        return lambda seconds: None
+    put = getattr(_paced_events, 'put', None)
+    if put:
+        return lambda seconds: put(Pause(seconds))
+    return time.sleep
+
 def extract_video_id(url):
-    """Extract YouTube video ID from URL"""
+    """Extract YouTube video ID from URL.
+    
+    Only well-formed 11-character IDs are accepted: the ID names cache
+    entries, checkpoints and downloaded files.
+    """
     patterns = [
-        r'(?:youtube\.com\/watch\?v=|youtu\.be\/|youtube\.com\/embed\/)([^&\n?#]+)',
+        r'(?:youtube\.com\/watch\?v=|youtu\.be\/|youtube\.com\/embed\/)([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])',
     ]
     for pattern in patterns:
         match = re.search(pattern, url)
@@ -43,122 +295,1161 @@ def extract_video_id(url):
             return match.group(1)
     return None
 
-def parse_vtt_file(vtt_path):
-    """Parse VTT subtitle file and extract text with timestamps merged into segments"""
-    transcriptions = []
+VTT_TAG_RE = re.compile(r'<[^>]+>')
+VTT_TIMESTAMP_RE = re.compile(r'(?:(\d+):)?(\d{1,2}):(\d{1,2}(?:[.,]\d+)?)')
+RANGE_TIME_RE = re.compile(r'\d+(?::\d{1,2})+(?:\.\d+)?')  # [HH:]MM:SS, minutes may run past 59 like format_timestamp's
+
+def format_timestamp(seconds):
+    """Format seconds as MM:SS (minutes keep counting past an hour)"""
+    seconds = int(seconds)
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+def parse_vtt_timestamp(value):
+    """Convert an HH:MM:SS.mmm or MM:SS.mmm cue timestamp to seconds"""
+    match = VTT_TIMESTAMP_RE.match(value.strip())
+    if not match:
+        return 0
+    hours, minutes, seconds = match.groups()
+    return int(hours or 0) * 3600 + int(minutes) * 60 + float(seconds.replace(',', '.'))
+
+def iter_vtt_cues(lines, dedupe=True):
+    """Yield (start_seconds, end_seconds, text) for each cue in a single pass over VTT lines.
+
+    YouTube auto-captions are "rolling": every cue repeats the line shown by the
+    previous one, plus 10 ms cues that only repeat text. With dedupe on, a line
+    identical to one of the last two emitted lines is dropped.
+    """
+    recent = deque(maxlen=2)
+    start = end = None
+    texts = []
+
+    def flush():
+        if start is None or not texts:
+            return None
+        return (start, end, ' '.join(texts))
+
+    for line in lines:
+        line = line.rstrip('\r\n')
+
+        if '-->' in line:
+            cue = flush()
+            if cue:
+                yield cue
+            start_part, end_part = line.split('-->', 1)
+            start = parse_vtt_timestamp(start_part)
+            end = parse_vtt_timestamp(end_part)
+            texts = []
+            continue
+
+        if start is None:
+            # Header, NOTE/STYLE blocks and cue identifiers
+            continue
+
+        if not line:
+            cue = flush()
+            if cue:
+                yield cue
+            start = end = None
+            texts = []
+            continue
+
+        text = (VTT_TAG_RE.sub('', line) if '<' in line else line).strip()
+        if not text:
+            continue
+        if dedupe:
+            if text in recent:
+                continue
+            recent.append(text)
+        texts.append(text)
+
+    cue = flush()
+    if cue:
+        yield cue
+
+def merge_vtt_cues(cues, segment_seconds=30):
+    """Group cues into fixed windows of segment_seconds.
+
+    Yields {'time', 'text'} per non-empty window. With segment_seconds None or
+    0, every cue is kept as {'time', 'start', 'end', 'text'}.
+    """
+    if not segment_seconds:
+        for start, end, text in cues:
+            yield {'time': format_timestamp(start), 'start': start, 'end': end, 'text': text}
+        return
+
+    segment_start = None
+    texts = []
+    for start, _, text in cues:
+        window_start = int(start // segment_seconds) * segment_seconds
+        if window_start != segment_start and texts:
+            yield {'time': format_timestamp(segment_start), 'text': ' '.join(texts)}
+            texts = []
+        segment_start = window_start
+        texts.append(text)
+
+    if texts:
+        yield {'time': format_timestamp(segment_start), 'text': ' '.join(texts)}
+
+def clip_cues(cues, start=0, end=None):
+    """Keep the cues that overlap [start, end). Reading stops at the first cue past end."""
+    for cue in cues:
+        cue_start, cue_end, _ = cue
+        if end is not None and cue_start >= end:
+            return
+        if cue_end > start:
+            yield cue
+
+def clip_transcriptions(transcriptions, start=0, end=None):
+    """Items of a finished transcript that overlap [start, end); each runs until the next one's time"""
+    # Segment times are format_timestamp() output, e.g. '123:45' past 100 minutes
+    times = [parse_segment_time(item['time']) for item in transcriptions]
+    return [item for i, item in enumerate(transcriptions)
+            if (end is None or times[i] < end) and (i + 1 == len(times) or times[i + 1] > start)]
+
+def parse_time_range(data):
+    """(start, end) in seconds from "start"/"end" request fields, given as seconds or [HH:]MM:SS.
     
+    start defaults to 0 and end to None (the end of the video). Raises
+    ValueError for malformed values or an empty range.
+    """
+    def seconds(name):
+        value = (data or {}).get(name)
+        if value is None or value == '':
+            return None
+        if isinstance(value, str) and RANGE_TIME_RE.fullmatch(value.strip()):
+            return parse_segment_time(value.strip())
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid {name} time: {data[name]}')
+        if not 0 <= value < float('inf'):
+            raise ValueError(f'Invalid {name} time: {data[name]}')
+        return value
+    
+    start, end = seconds('start') or 0, seconds('end')
+    if end is not None and end <= start:
+        raise ValueError('end must be after start')
+    return start, end
+
+def parse_vtt_file(vtt_path, segment_seconds=30, dedupe=True):
+    """Parse VTT subtitle file and extract text with timestamps merged into segments"""
     try:
         with open(vtt_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+            return list(merge_vtt_cues(iter_vtt_cues(f, dedupe=dedupe), segment_seconds))
+    except Exception as e:
+        print(f"Error parsing VTT file: {str(e)}")
+        return []
+
+def find_caption_track(info, language):
+    """Return (VTT URL, automatic) of the best caption track for a language, or (None, False).
+
+    Manual subtitles win over automatic captions, and an exact language code
+    wins over regional variants (e.g. 'en' falls back to 'en-US', 'en-GB').
+    automatic is True for a track from automatic_captions.
+    """
+    for automatic, key in ((False, 'subtitles'), (True, 'automatic_captions')):
+        tracks = info.get(key) or {}
+        codes = [code for code in tracks if code == language]
+        codes += sorted(code for code in tracks if code.startswith(f'{language}-'))
+        for code in codes:
+            for track in tracks[code]:
+                if track.get('ext') == 'vtt' and track.get('url'):
+                    return track['url'], automatic
+    return None, False
+
+def fetch_caption_track(url, segment_seconds=30, start=0, end=None, automatic=True):
+    """Download a VTT caption track into memory and parse the cues in [start, end) into segments.
+    
+    Only automatic (rolling) captions are de-duplicated; manual subtitles can
+    repeat a line on purpose ("No." ... "No.").
+    """
+    with metrics.span('caption_download'), pooled_ydl('metadata') as ydl:
+        content = ydl.urlopen(url).read()
+    metrics.inc('namor_caption_bytes_total', len(content))
+    with metrics.span('vtt_parse'):
+        cues = clip_cues(iter_vtt_cues(content.decode('utf-8').splitlines(), dedupe=automatic), start, end)
+        return list(merge_vtt_cues(cues, segment_seconds))
+
+def store_transcript(video_id, language, source, video_title, transcriptions):
+    """Cache a finished video transcript and add it to the search index"""
+    transcript_cache.put(video_id, language, source, video_title, transcriptions)
+    try:
+        with metrics.span('search_index'):
+            search_index.add(video_id, language, source, video_title, transcriptions)
+    except Exception as e:
+        # The transcript is still delivered and cached, it just isn't searchable
+        print(f"Error indexing transcript {video_id}: {str(e)}")
+
+def recognizer_language(language):
+    """Map a caption language code to a recognize_google language"""
+    return 'en-US' if language == 'en' else language
+
+def probe_duration(path):
+    """Return the duration of a media file in seconds using ffprobe"""
+    with metrics.span('probe'):
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'json', path],
+            capture_output=True, text=True, check=True
+        )
+    info = json.loads(result.stdout)
+    return float(info.get('format', {}).get('duration') or 0)
+
+def ffmpeg_input_args(path, headers=None, start_seconds=0, end_seconds=None):
+    """ffmpeg input options for a local file, an HTTP(S) URL with request headers or a
+    binary stream (fed through stdin), reading from start_seconds to end_seconds"""
+    args = ['-ss', f'{start_seconds:.3f}'] if start_seconds else []
+    if end_seconds is not None:
+        args += ['-t', f'{max(end_seconds - start_seconds, 0):.3f}']
+    if not isinstance(path, str):
+        return args + ['-i', 'pipe:0']
+    if path.startswith(('http://', 'https://')):
+        args += ['-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5']
+        if headers:
+            args += ['-headers', ''.join(f'{key}: {value}\r\n' for key, value in headers.items())]
+    return args + ['-i', path]
+
+def feed_stdin(process, stream):
+    """Copy a binary stream into ffmpeg's stdin until EOF or until ffmpeg exits"""
+    try:
+        for block in iter(lambda: stream.read(UPLOAD_BLOCK_BYTES), b''):
+            process.stdin.write(block)
+    except (BrokenPipeError, OSError, ValueError):
+        # ffmpeg exited (or was killed) before the input ended
+        pass
+    finally:
+        try:
+            process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+def ffmpeg_pcm_blocks(path, sample_rate=RECOGNIZER_SAMPLE_RATE, block_seconds=1.0, headers=None, start_seconds=0,
+                      end_seconds=None):
+    """Decode media (a file, URL or binary stream) with ffmpeg to mono s16le PCM, yielding raw blocks of block_seconds"""
+    block_bytes = int(sample_rate * block_seconds) * 2
+    piped = not isinstance(path, str)
+    process = subprocess.Popen(
+        ['ffmpeg', '-nostdin', '-v', 'error', *ffmpeg_input_args(path, headers, start_seconds, end_seconds), '-vn',
+         '-f', 's16le', '-acodec', 'pcm_s16le', '-ac', '1', '-ar', str(sample_rate), '-'],
+        stdin=subprocess.PIPE if piped else None, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    if piped:
+        # Fed from a thread so decoding (and recognition) runs while the input is still arriving
+        threading.Thread(target=feed_stdin, args=(process, path), daemon=True).start()
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            yield data
         
-        # Split by double newlines to get cue blocks
-        blocks = content.split('\n\n')
+        process.wait()
+        if process.returncode != 0:
+            error = process.stderr.read().decode('utf-8', 'replace').strip()
+            raise RuntimeError(f"ffmpeg failed to decode audio: {error}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+def frame_rms(samples, frame_length):
+    """RMS energy of each consecutive frame of 16-bit samples"""
+    n_frames = len(samples) // frame_length
+    frames = samples[:n_frames * frame_length].reshape(n_frames, frame_length).astype(np.float32)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+def noise_threshold(samples, frame_length):
+    """Speech threshold from the noise floor (a low percentile of frame RMS) of a PCM buffer"""
+    rms = frame_rms(samples, frame_length)
+    if not len(rms):
+        return VAD_ENERGY_THRESHOLD
+    floor = float(np.percentile(rms, VAD_NOISE_PERCENTILE))
+    return min(max(floor * VAD_NOISE_RATIO, VAD_ENERGY_THRESHOLD), VAD_MAX_ENERGY_THRESHOLD)
+
+def stream_speech_chunks(path, sample_rate=RECOGNIZER_SAMPLE_RATE, max_seconds=CHUNK_SECONDS,
+                         threshold=None, headers=None, start_seconds=0, end_seconds=None):
+    """Decode media and yield (start_seconds, sr.AudioData) for each speech region.
+
+    Frames whose RMS energy exceeds the threshold count as speech. Unless a
+    threshold is given, it is calibrated once per file from the noise floor
+    of the first VAD_CALIBRATION_SECONDS and reused for every region. Pauses
+    shorter than VAD_MIN_SILENCE are bridged, regions shorter than
+    VAD_MIN_SPEECH are dropped as clicks, and regions longer than max_seconds
+    are split at the quietest frame near the limit so words are not cut.
+    Non-speech audio never reaches the recognizer, and only about max_seconds
+    of PCM is buffered at a time. Decoding runs from start_seconds to
+    end_seconds (the end of the media if None), and yielded times are
+    relative to the start of the media.
+    """
+    frame_length = int(sample_rate * VAD_FRAME_MS / 1000)
+    frames_per_second = 1000 / VAD_FRAME_MS
+    pad = max(1, int(VAD_MIN_SILENCE * frames_per_second / 2))
+    max_frames = int(max_seconds * frames_per_second)
+    min_frames = int(VAD_MIN_SPEECH * frames_per_second)
+    split_frames = min(max_frames // 2, int(VAD_SPLIT_SEARCH * frames_per_second))
+    
+    calibration_samples = int(VAD_CALIBRATION_SECONDS * sample_rate)
+    
+    blocks = ffmpeg_pcm_blocks(path, sample_rate, headers=headers, start_seconds=start_seconds,
+                               end_seconds=end_seconds)
+    buffer = np.zeros(0, dtype=np.int16)
+    offset = 0  # Samples already dropped from the front of the buffer
+    eof = False
+    
+    while True:
+        if threshold is None and (eof or len(buffer) >= calibration_samples):
+            # One vectorized pass over the opening stretch sets the threshold for the whole file
+            threshold = noise_threshold(buffer, frame_length)
+        n_frames = len(buffer) // frame_length if threshold is not None else 0
+        cut = None
+        if n_frames:
+            rms = frame_rms(buffer, frame_length)
+            loud = rms > threshold
+            # Dilate speech frames by pad on each side: bridges short pauses and pads region edges
+            voiced = np.convolve(loud, np.ones(2 * pad + 1), mode='same') > 0
+            # The last pad frames can still change once more audio arrives
+            settled = n_frames if eof else max(0, n_frames - pad)
+            
+            voiced_frames = np.flatnonzero(voiced[:settled])
+            if not len(voiced_frames):
+                start = settled
+            else:
+                start = int(voiced_frames[0])
+                silent_frames = np.flatnonzero(~voiced[start:settled])
+                if len(silent_frames) and silent_frames[0] <= max_frames:
+                    cut = start + int(silent_frames[0])
+                elif settled - start >= max_frames:
+                    lo = start + max_frames - split_frames
+                    cut = lo + int(np.argmin(rms[lo:start + max_frames]))
+                elif eof:
+                    cut = settled
+            
+            if cut is not None:
+                if np.count_nonzero(loud[start:cut]) >= min_frames:
+                    region = buffer[start * frame_length:cut * frame_length]
+                    yield (start_seconds + (offset + start * frame_length) / sample_rate,
+                           sr.AudioData(region.tobytes(), sample_rate, 2))
+                start = cut
+            
+            # Drop everything before the next region
+            buffer = buffer[start * frame_length:]
+            offset += start * frame_length
+            if cut is not None:
+                continue
         
-        raw_captions = []
+        if eof:
+            break
+        block = next(blocks, None)
+        if block is None:
+            eof = True
+        else:
+            buffer = np.concatenate([buffer, np.frombuffer(block, dtype='<i2')])
+
+def stored_upload_path(sha, filename):
+    """Path for one stored upload: named by content hash plus a per-upload suffix.
+
+    Every upload owns its file, so the run that transcribes it can delete it
+    without pulling it from under another run of the same content.
+    """
+    return os.path.join(UPLOAD_FOLDER, f'{sha}-{uuid.uuid4().hex[:8]}{os.path.splitext(filename)[1].lower()}')
+
+def store_upload(stream, filename):
+    """Save an upload under its content hash, hashing it while it is received.
+
+    Returns (path, sha256). Same-named uploads from different clients never
+    overwrite each other.
+    """
+    digest = hashlib.sha256()
+    tmp_path = os.path.join(UPLOAD_FOLDER, f'.{uuid.uuid4().hex}.part')
+    with open(tmp_path, 'wb') as f:
+        for block in iter(lambda: stream.read(UPLOAD_BLOCK_BYTES), b''):
+            digest.update(block)
+            f.write(block)
+    sha = digest.hexdigest()
+    path = stored_upload_path(sha, filename)
+    os.replace(tmp_path, path)
+    return path, sha
+
+def remove_upload(path):
+    """Delete a stored upload that is no longer needed"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def selected_audio_stream(ydl, info):
+    """Resolve the audio format yt-dlp would download to a URL ffmpeg can stream, or None"""
+    selected = ydl.process_ie_result(copy.deepcopy(info), download=False)
+    # Separate video+audio formats would need merging, leave those to the downloader
+    if selected.get('requested_formats') or not selected.get('url'):
+        return None
+    if selected.get('protocol') not in PIPELINE_PROTOCOLS:
+        return None
+    return selected
+
+def peek_chunks(chunks):
+    """Start a chunk stream, raising now if ffmpeg cannot open its source at all"""
+    first = next(chunks, None)
+    return itertools.chain([first] if first else [], chunks)
+
+# One scheduler per remote backend: rate limit, adaptive concurrency and circuit breaker
+# across every request this process serves. The rate budget itself is kept on disk and
+# shared with the job worker processes, so together they stay within RECOGNIZER_RATE.
+RATE_LIMIT_DB = os.path.join(CACHE_FOLDER, 'rate_limits.db')
+recognizer_schedulers = {
+    name: RecognizerScheduler(
+        name,
+        rate=RECOGNIZER_RATE,
+        burst=RECOGNIZER_BURST,
+        initial_limit=RECOGNIZER_WORKERS,
+        max_limit=RECOGNIZER_MAX_CONCURRENCY,
+        retries=RECOGNIZER_RETRIES,
+        backoff=RECOGNIZER_BACKOFF,
+        failure_threshold=RECOGNIZER_FAILURE_THRESHOLD,
+        cooldown=RECOGNIZER_COOLDOWN,
+        bucket=SharedTokenBucket(RATE_LIMIT_DB, name, RECOGNIZER_RATE, RECOGNIZER_BURST)
+    )
+    for name in recognizers.BACKENDS if not recognizers.is_local(name)
+}
+
+def local_recognizer_pool(broken=None):
+    """Process pool shared by every request that uses a local (CPU) recognizer backend.
+    
+    A worker that dies (OOM kill, crash in Vosk/Sphinx) breaks the pool for
+    good; pass the pool that raised BrokenProcessPool as broken to replace it.
+    """
+    global _local_recognizer_pool
+    with _local_recognizer_lock:
+        if broken is not None and _local_recognizer_pool is broken:
+            _local_recognizer_pool = None
+            broken.shutdown(wait=False)
+        if _local_recognizer_pool is None:
+            _local_recognizer_pool = ProcessPoolExecutor(
+                max_workers=LOCAL_RECOGNIZER_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _local_recognizer_pool
+
+def transcribe_chunk(audio_data, language='en-US', engine=RECOGNIZER_ENGINE):
+    """Transcribe one audio chunk with a remote backend through its shared scheduler.
+
+    Returns the recognized text ('' when no speech was understood). Raises
+    sr.RequestError once all retries are exhausted or while the backend's
+    circuit breaker is open.
+    """
+    return recognizer_schedulers[engine].call(recognizers.recognize, engine, audio_data, language)
+
+def transcribe_chunks(chunks, workers=RECOGNIZER_WORKERS, language='en-US', engine=RECOGNIZER_ENGINE):
+    """Transcribe an iterable of (start_seconds, audio_data) chunks in parallel.
+
+    Remote backends run on a per-call thread pool of `workers`; local CPU
+    backends run on the shared process pool so they use every core (inside
+    a job worker, one at a time in that process). Chunks
+    are pulled lazily, at most two per worker in flight, so a streaming
+    source is never read far ahead of the recognizer. Yields (start_seconds,
+    end_seconds, text) in chunk order as soon as each chunk and all the ones
+    before it are done, so partial results stay in timestamp order. Chunks
+    that fail with anything other than an API error yield None as the text.
+    """
+    local = recognizers.is_local(engine)
+    if local and in_job_worker():
+        # Job workers already run one per core: recognize here rather than in a pool per worker
+        executor = ThreadPoolExecutor(max_workers=1)
+        workers = 1
+        owns_executor = True
+        submit = lambda chunk: executor.submit(recognizers.recognize_timed, engine, chunk, language)
+    elif local:
+        # Submitted straight to recognizers so workers never import the whole app
+        executor = local_recognizer_pool()
+        workers = LOCAL_RECOGNIZER_WORKERS
+        owns_executor = False
         
-        for block in blocks:
-            lines = block.strip().split('\n')
-            
-            # Skip WEBVTT header and NOTE blocks
-            if len(lines) < 2 or lines[0].startswith('WEBVTT') or lines[0].startswith('NOTE'):
+        def submit(chunk):
+            nonlocal executor
+            try:
+                return executor.submit(recognizers.recognize_timed, engine, chunk, language)
+            except BrokenProcessPool:
+                # Chunks already in the broken pool fail (and yield None), the rest go to a new one
+                executor = local_recognizer_pool(broken=executor)
+                return executor.submit(recognizers.recognize_timed, engine, chunk, language)
+    else:
+        executor = ThreadPoolExecutor(max_workers=max(1, workers))
+        owns_executor = True
+        submit = lambda chunk: executor.submit(transcribe_chunk, chunk, language, engine)
+    pending = deque()
+
+    def result(idx, future):
+        try:
+            if not local:
+                return future.result()
+            # Timed in the worker process, the wait in the pool queue doesn't count
+            text, seconds = future.result()
+            metrics.observe('namor_recognizer_seconds', seconds, engine=engine)
+            return text
+        except sr.RequestError:
+            if local:
+                metrics.inc('namor_recognizer_errors_total', engine=engine, error='request')
+            raise
+        except Exception as e:
+            metrics.inc('namor_recognizer_errors_total', engine=engine, error='exception')
+            print(f"Error processing chunk {idx}: {str(e)}")
+            return None
+
+    try:
+        for idx, (start, chunk) in enumerate(chunks):
+            end = start + len(chunk.frame_data) / (chunk.sample_rate * chunk.sample_width)
+            metrics.inc('namor_chunks_total', engine=engine)
+            metrics.inc('namor_audio_bytes_total', len(chunk.frame_data), engine=engine)
+            pending.append((idx, start, end, submit(chunk)))
+            if len(pending) >= 2 * workers:
+                idx, start, end, future = pending.popleft()
+                yield start, end, result(idx, future)
+
+        while pending:
+            idx, start, end, future = pending.popleft()
+            yield start, end, result(idx, future)
+    finally:
+        for _, _, _, future in pending:
+            future.cancel()
+        if owns_executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+EVENTS_END = object()
+
+def run_events(events, put, stopped, pace=False):
+    """Iterate an event generator on a helper thread, handing each event to put().
+
+    Stops between events once stopped is set, and always ends with EVENTS_END.
+    With pace, the generator's display pauses are handed to put() as Pause
+    values instead of blocking the thread, for the caller to wait out.
+    """
+    if pace:
+        _paced_events.put = put
+    try:
+        for event in events:
+            put(event)
+            if stopped.is_set():
+                break
+    except Exception as e:
+        put({'progress': 100, 'error': f'Error: {str(e)}'})
+    finally:
+        events.close()
+        _paced_events.put = None
+        put(EVENTS_END)
+
+class CompactEvents:
+    """Rewrites progress events into the compact stream protocol.
+    
+    Partial results and plain progress messages that arrive within
+    SSE_FLUSH_INTERVAL are sent as one event: {"progress", "message" (the
+    latest), "partials" or "partial_texts"}. A final event whose transcript
+    only repeats the partials already sent carries "done": true instead.
+    """
+    BATCH_KEYS = {'partial': 'partials', 'partial_text': 'partial_texts'}
+    
+    def __init__(self, flush_interval=SSE_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self.batch = None
+        self.batch_started = None
+        self.sent = {'partial': [], 'partial_text': []}
+    
+    def flush_due_in(self):
+        """Seconds until the pending batch must be sent, None when nothing is pending"""
+        if self.batch is None:
+            return None
+        return max(0.0, self.batch_started + self.flush_interval - time.monotonic())
+    
+    def flush(self):
+        """Return the pending batch (as a list of zero or one events)"""
+        batch, self.batch = self.batch, None
+        return [batch] if batch else []
+    
+    def add(self, event):
+        """Take one event and return the events to send now"""
+        keys = set(event) - {'progress', 'message'}
+        if len(keys) > 1 or not keys <= set(self.BATCH_KEYS):
+            # Errors, titles, results...: sent right away, after what came before them
+            return self.flush() + [self.finish(event)]
+        
+        if self.batch is None:
+            self.batch = {}
+            self.batch_started = time.monotonic()
+        if 'progress' in event:
+            self.batch['progress'] = event['progress']
+        if 'message' in event:
+            self.batch['message'] = event['message']
+        for key in keys:
+            self.sent[key].append(event[key])
+            self.batch.setdefault(self.BATCH_KEYS[key], []).append(event[key])
+        return self.flush() if self.flush_due_in() == 0 else []
+    
+    def finish(self, event):
+        if 'transcriptions' in event and event['transcriptions'] == self.sent['partial']:
+            event = {k: v for k, v in event.items() if k != 'transcriptions'}
+            event['done'] = True
+        elif 'transcription' in event and event['transcription'] == ' '.join(self.sent['partial_text']):
+            event = {k: v for k, v in event.items() if k != 'transcription'}
+            event['done'] = True
+        return event
+
+def compact_events(events, flush_interval=SSE_FLUSH_INTERVAL):
+    """Rewrite an event generator into the compact protocol.
+    
+    The generator is read on a helper thread, so a batch goes out on time
+    even while the generator is blocked (e.g. waiting on the recognizer).
+    """
+    ready = queue.Queue()
+    stopped = threading.Event()
+    threading.Thread(target=run_events, args=(events, ready.put, stopped), daemon=True).start()
+    compactor = CompactEvents(flush_interval)
+    try:
+        while True:
+            try:
+                event = ready.get(timeout=compactor.flush_due_in())
+            except queue.Empty:
+                yield from compactor.flush()
                 continue
+            if event is EVENTS_END:
+                break
+            yield from compactor.add(event)
+        yield from compactor.flush()
+    finally:
+        stopped.set()
+
+def format_sse(event, compact=False):
+    """One event dict as a Server-Sent Event"""
+    if compact:
+        return f"data: {json.dumps(event, separators=(',', ':'), ensure_ascii=False)}\n\n"
+    return f"data: {json.dumps(event)}\n\n"
+
+def accepted_stream_encoding(accept_encoding):
+    """Best of SSE_ENCODINGS allowed by an Accept-Encoding header, None for identity"""
+    accepted = set()
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(name.strip())
+    return next((encoding for encoding in SSE_ENCODINGS if encoding in accepted), None)
+
+def stream_compressor(encoding):
+    """zlib compressor producing a gzip or deflate (zlib) body, None for identity"""
+    if encoding is None:
+        return None
+    return zlib.compressobj(SSE_COMPRESSION_LEVEL, zlib.DEFLATED, 31 if encoding == 'gzip' else 15)
+
+def sse_stream(events, compact=False, encoding=None):
+    """Format event dicts as Server-Sent Events, optionally compact and compressed"""
+    if compact:
+        events = compact_events(events)
+    compressor = stream_compressor(encoding)
+    for event in events:
+        data = format_sse(event, compact)
+        if compressor:
+            # Sync flush: every event reaches the client now, not when the compressor's buffer fills
+            yield compressor.compress(data.encode('utf-8')) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        else:
+            yield data
+    if compressor:
+        yield compressor.flush()
+
+def event_stream_response(events, data=None):
+    """SSE response for an event generator; compact (and compressed when accepted) with ?compact=1"""
+    compact = request_flag('compact', data)
+    encoding = accepted_stream_encoding(request.headers.get('Accept-Encoding', '')) if compact else None
+    headers = {'Vary': 'Accept-Encoding'}
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return Response(sse_stream(events, compact, encoding), mimetype='text/event-stream', headers=headers)
+
+@metrics.instrument_events('youtube')
+def youtube_transcription_events(youtube_url, video_id, refresh=False, fast=False, language=TRANSCRIPT_LANGUAGE,
+                                 engine=RECOGNIZER_ENGINE, start=0, end=None):
+    """Transcribe a YouTube video, yielding progress event dicts (captions first, then speech-to-text).
+    
+    With start/end (seconds) only that part of the video is fetched and
+    transcribed; timestamps stay relative to the start of the video.
+    """
+    pause = make_pause(fast)
+    ranged = bool(start) or end is not None
+    checkpointed = False
+    scratch_audio = None  # Download of a run without a checkpoint, removed at the end
+    try:
+        # Serve repeat requests straight from the transcript cache (a range is cut from the whole transcript)
+        cached = None if refresh else transcript_cache.get(video_id, language)
+        if not refresh:
+            metrics.inc('namor_cache_requests_total', result='hit' if cached else 'miss')
+        if cached:
+            transcriptions = cached['transcriptions']
+            if ranged:
+                transcriptions = clip_transcriptions(transcriptions, start, end)
+            yield {'progress': 50, 'message': '⚡ Loaded from cache', 'video_title': cached['video_title']}
+            for item in transcriptions:
+                yield {'progress': 90, 'partial': item}
+            yield {'progress': 100, 'message': 'Complete!', 'transcriptions': transcriptions, 'video_title': cached['video_title'], 'source': cached['source']}
+            return
+        
+        yield {'progress': 5, 'message': 'Validating YouTube URL...'}
+        pause(0.3)
+        
+        yield {'progress': 10, 'message': 'Checking for available captions...'}
+        
+        # First, try to get captions/subtitles
+        video_title = 'Unknown'
+        
+        # Metadata is extracted once and reused by the audio fallback below
+        info = None
+        
+        try:
+            with metrics.span('extract_info'), pooled_ydl('metadata') as ydl:
+                info = ydl.extract_info(youtube_url, download=False, process=False)
+            video_title = info.get('title', 'Unknown')
             
-            # Look for timestamp line (format: 00:00:00.000 --> 00:00:05.000)
-            timestamp_line = None
-            text_lines = []
-            
-            for i, line in enumerate(lines):
-                if '-->' in line:
-                    timestamp_line = line
-                    # Everything after timestamp is text
-                    text_lines = lines[i+1:]
-                    break
+            # Check for subtitles in the requested language
+            track_url, automatic = find_caption_track(info, language)
             
-            if timestamp_line and text_lines:
-                # Extract start time
-                start_time = timestamp_line.split('-->')[0].strip()
+            if track_url:
+                yield {'progress': 15, 'message': '✅ Captions found! Downloading...', 'video_title': video_title}
+                
+                # Download captions in memory, parsing only the requested range
+                transcriptions = fetch_caption_track(track_url, start=start, end=end, automatic=automatic)
                 
-                # Convert HH:MM:SS.mmm to total seconds
-                time_parts = start_time.split(':')
-                if len(time_parts) >= 3:
-                    hours = int(time_parts[0])
-                    minutes = int(time_parts[1])
-                    seconds = float(time_parts[2])
+                if transcriptions:
+                    yield {'progress': 30, 'message': 'Processing captions...', 'video_title': video_title}
+                    pause(0.3)
+                    
+                    yield {'progress': 50, 'message': 'Formatting transcription...'}
+                    
+                    # Send partial results ONE AT A TIME for smooth typing animation
+                    for idx, item in enumerate(transcriptions):
+                        progress = 50 + int((idx / len(transcriptions)) * 40)
+                        # Mark as caption source for faster typing
+                        item['source'] = 'caption'
+                        yield {'progress': progress, 'partial': item}
+                        # Longer delay so typing animation has time to complete each segment (skipped in fast mode)
+                        pause(0.5)
+                    
+                    if not ranged:
+                        store_transcript(video_id, language, 'captions', video_title, transcriptions)
                     
-                    total_seconds = hours * 3600 + minutes * 60 + seconds
+                    yield {'progress': 95, 'message': '✅ Captions transcribed successfully!'}
+                    pause(0.3)
+                    
+                    yield {'progress': 100, 'message': 'Complete!', 'transcriptions': transcriptions, 'video_title': video_title, 'source': 'captions'}
+                    return
+            else:
+                yield {'progress': 15, 'message': 'ℹ️ No captions found. Using speech-to-text...', 'video_title': video_title}
+                
+        except Exception as e:
+            yield {'progress': 15, 'message': 'ℹ️ Caption check failed. Using speech-to-text...', 'video_title': video_title}
+        
+        # Fallback to audio transcription if no subtitles
+        yield {'progress': 20, 'message': 'Preparing audio from YouTube...'}
+        
+        # Chunks finished by an interrupted earlier run are replayed, decoding resumes after them
+        checkpoint_params = {'language': language, 'engine': engine}
+        if ranged:
+            checkpoint_params['range'] = [start, end]
+        done = checkpoints.open(video_id, checkpoint_params)
+        checkpointed = done is not None
+        if not checkpointed:
+            # Another run of this video holds the checkpoint: transcribe without one
+            done = []
+        resume_at = done[-1]['end'] if done else start
+        audio_path = checkpoints.audio_path(video_id) if checkpointed else None
+        if done:
+            yield {'progress': 20, 'message': f'↩️ Resuming from {format_timestamp(resume_at)}...'}
+        
+        stream = None
+        with pooled_ydl('audio') as ydl:
+            if info is None:
+                with metrics.span('extract_info'):
+                    info = ydl.extract_info(youtube_url, download=False, process=False)
+                video_title = info.get('title', 'Unknown')
+            if PIPELINE_DOWNLOADS and audio_path is None:
+                with metrics.span('audio_resolve'):
+                    stream = selected_audio_stream(ydl, info)
+        
+        # Only speech regions are sent to the recognizer
+        chunks = None
+        if stream:
+            # Pipelined: ffmpeg downloads and decodes while earlier chunks are recognized
+            try:
+                chunks = peek_chunks(stream_speech_chunks(stream['url'], headers=stream.get('http_headers'),
+                                                          start_seconds=resume_at, end_seconds=end))
+                duration_seconds = stream.get('duration') or info.get('duration') or 0
+                yield {'progress': 35, 'message': f'Streaming audio: {video_title}', 'video_title': video_title}
+            except RuntimeError as e:
+                print(f"Audio streaming failed, downloading instead: {str(e)}")
+        
+        if chunks is None:
+            if audio_path is None:
+                yield {'progress': 25, 'message': 'Downloading audio from YouTube...'}
+                # Named per run, so concurrent downloads of the same video don't share a file
+                output_path = os.path.join(UPLOAD_FOLDER, f'{video_id}-{uuid.uuid4().hex}')
+                with metrics.span('audio_download'), pooled_ydl('audio') as ydl:
+                    outtmpl = ydl.params['outtmpl']
+                    ydl.params['outtmpl'] = dict(outtmpl, default=output_path)
+                    if ranged:
+                        # Section download: yt-dlp fetches only the requested range through ffmpeg
+                        ydl.params['download_ranges'] = yt_dlp.utils.download_range_func(
+                            None, [(start, float('inf') if end is None else end)])
+                    try:
+                        result = ydl.process_ie_result(copy.deepcopy(info), download=True)
+                    finally:
+                        ydl.params['outtmpl'] = outtmpl
+                        ydl.params.pop('download_ranges', None)
+                
+                # Whatever container bestaudio came in; no intermediate WAV is written. Kept
+                # with the checkpoint so a retry doesn't download it again.
+                downloaded = (result.get('requested_downloads') or [{}])[0].get('filepath') or output_path
+                if checkpointed:
+                    audio_path = checkpoints.keep_audio(video_id, downloaded)
                 else:
-                    total_seconds = 0
+                    audio_path = scratch_audio = downloaded
                 
-                # Join text lines and remove HTML tags
-                text = ' '.join(text_lines)
-                text = re.sub(r'<[^>]+>', '', text)  # Remove HTML tags
-                text = text.strip()
+                yield {'progress': 35, 'message': f'Downloaded: {video_title}', 'video_title': video_title}
+                pause(0.3)
+            
+            # Load audio and prepare for transcription
+            yield {'progress': 40, 'message': 'Loading audio file...'}
+            
+            # Probe audio file, the PCM itself is streamed chunk by chunk
+            duration_seconds = probe_duration(audio_path)
+            if ranged:
+                # The file holds only the range: seek and timestamp relative to its start
+                duration_seconds += start
+                chunks = ((offset + start, audio_data) for offset, audio_data
+                          in stream_speech_chunks(audio_path, start_seconds=resume_at - start))
+            else:
+                chunks = stream_speech_chunks(audio_path, start_seconds=resume_at)
+        
+        # Progress and durations cover the requested range only
+        if end is not None and (not duration_seconds or end < duration_seconds):
+            duration_seconds = end
+        range_seconds = max(duration_seconds - start, 0)
+        
+        yield {'progress': 45, 'message': f'Duration: {int(range_seconds//60)}m {int(range_seconds%60)}s'}
+        pause(0.3)
+        
+        yield {'progress': 50, 'message': 'Detecting speech segments...'}
+        pause(0.3)
+        
+        # Transcribe chunks in parallel, results arrive in timestamp order
+        transcriptions = []
+        for chunk in done:
+            if chunk['text'].strip():
+                item = {'time': format_timestamp(chunk['start']), 'text': chunk['text']}
+                transcriptions.append(item)
+                yield {'progress': 50, 'partial': item}
+        
+        try:
+            for chunk_start, chunk_end, text in transcribe_chunks(chunks, language=recognizer_language(language),
+                                                                  engine=engine):
+                if checkpointed:
+                    checkpoints.append(video_id, chunk_start, chunk_end, text or '')
+                resume_at = chunk_end
+                
+                # Calculate progress (50% to 90% for processing)
+                progress = 50 + int(min((chunk_start - start) / range_seconds, 1) * 40) if range_seconds else 50
                 
-                if text:
-                    raw_captions.append({
-                        'seconds': total_seconds,
+                if text and text.strip():
+                    # Add timestamp
+                    item = {
+                        'time': format_timestamp(chunk_start),
                         'text': text
-                    })
+                    }
+                    transcriptions.append(item)
+                    # Send partial result immediately
+                    yield {'progress': progress, 'partial': item}
+                
+                yield {'progress': progress, 'message': f'Transcribing... {format_timestamp(chunk_start)} / {format_timestamp(duration_seconds)}'}
+        except sr.RequestError as e:
+            if checkpointed:
+                yield {'progress': 100, 'error': f'API error: {str(e)} (progress saved, retry to resume from {format_timestamp(resume_at)})'}
+            else:
+                yield {'progress': 100, 'error': f'API error: {str(e)}'}
+            return
         
-        # Merge captions into 30-second blocks
-        if not raw_captions:
-            return []
+        yield {'progress': 95, 'message': 'Finalizing transcription...'}
+        pause(0.3)
         
-        segment_duration = 30  # 30 seconds per segment
-        current_segment = {
-            'start_seconds': 0,
-            'texts': []
-        }
+        # Complete, the checkpoint (and its audio) is no longer needed
+        if checkpointed:
+            checkpoints.clear(video_id)
         
-        for caption in raw_captions:
-            caption_time = caption['seconds']
-            segment_index = int(caption_time // segment_duration)
-            segment_start = segment_index * segment_duration
+        if transcriptions:
+            if not ranged:
+                store_transcript(video_id, language, 'audio', video_title, transcriptions)
+            yield {'progress': 100, 'message': 'Complete!', 'transcriptions': transcriptions, 'video_title': video_title, 'source': 'audio'}
+        else:
+            yield {'progress': 100, 'error': 'Could not transcribe audio. The video might not contain clear speech.'}
             
-            # If this caption belongs to a new segment, save the old one
-            if segment_start != current_segment['start_seconds'] and current_segment['texts']:
-                # Save current segment
-                combined_text = ' '.join(current_segment['texts'])
-                minutes = int(current_segment['start_seconds'] // 60)
-                seconds = int(current_segment['start_seconds'] % 60)
+    except Exception as e:
+        yield {'progress': 100, 'error': f'Error: {str(e)}'}
+    
+    finally:
+        # Also when the stream stops early; an unfinished checkpoint stays for a retry
+        if checkpointed:
+            checkpoints.release(video_id)
+        if scratch_audio and os.path.exists(scratch_audio):
+            try:
+                os.remove(scratch_audio)
+            except OSError:
+                pass
+
+class UploadStream:
+    """Read-only view of a request body that counts and hashes the bytes consumed"""
+    
+    def __init__(self, stream, content_length=None):
+        self.stream = stream
+        self.content_length = content_length
+        self.bytes_read = 0
+        self.digest = hashlib.sha256()
+    
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.bytes_read += len(data)
+        self.digest.update(data)
+        return data
+    
+    def hexdigest(self):
+        """SHA-256 of everything read so far (the whole body once decoding has finished)"""
+        return self.digest.hexdigest()
+    
+    def fraction(self):
+        """Share of the body read so far, 0 when the length is unknown"""
+        if not self.content_length:
+            return 0
+        return min(self.bytes_read / self.content_length, 1)
+
+@metrics.instrument_events('upload')
+def upload_transcription_events(file_path, fast=False, engine=RECOGNIZER_ENGINE, upload_stream=None,
+                                content_sha=None):
+    """Transcribe an uploaded audio/video file, yielding progress event dicts.
+    
+    With upload_stream (an UploadStream of the request body) nothing is saved:
+    file_path only names the upload, and the body is decoded as it arrives.
+    content_sha is the upload's SHA-256 when known up front; it keys the
+    transcript cache and checkpoints. Streamed bodies are hashed as they are
+    read and cached under that hash once complete.
+    """
+    # Video formats that need audio extraction
+    video_formats = ['.mp4', '.avi', '.mkv', '.mov', '.flv', '.wmv', '.webm', '.m4v', '.mpeg', '.mpg', '.3gp']
+    audio_formats = ['.mp3', '.wav', '.m4a', '.aac', '.ogg', '.flac', '.wma']
+    
+    file_ext = os.path.splitext(file_path)[1].lower()
+    pause = make_pause(fast)
+    checkpoint_key = None
+    
+    try:
+        # Content seen before: answer from the transcript cache without decoding anything
+        cached = content_sha and transcript_cache.get(f'upload:{content_sha}', TRANSCRIPT_LANGUAGE, sources=('audio',))
+        if content_sha:
+            metrics.inc('namor_cache_requests_total', result='hit' if cached else 'miss')
+        if cached:
+            yield {'progress': 50, 'message': '⚡ Loaded from cache'}
+            for text in cached['transcriptions']:
+                yield {'progress': 90, 'partial_text': text}
+            yield {'progress': 100, 'message': 'Complete!', 'transcription': ' '.join(cached['transcriptions'])}
+            return
+        
+        if file_ext in video_formats:
+            yield {'progress': 5, 'message': 'Extracting audio from video...'}
+            pause(0.3)
+        elif file_ext not in audio_formats:
+            yield {'progress': 100, 'error': 'Unsupported file format. Please upload audio or video files.'}
+            return
+        
+        if upload_stream is not None:
+            # Streamed: the duration is unknown until the end, progress follows the bytes received
+            yield {'progress': 10, 'message': 'Receiving audio...'}
+            duration_seconds = 0
+        else:
+            # ffmpeg decodes the original file straight to recognizer PCM, no WAV round-trip
+            yield {'progress': 10, 'message': 'Loading audio file...'}
+            
+            duration_seconds = probe_duration(file_path)
+            
+            yield {'progress': 15, 'message': f'Audio duration: {int(duration_seconds//60)}m {int(duration_seconds%60)}s'}
+            pause(0.3)
+        
+        # Uploads are checkpointed by content, so re-uploading the same file resumes it
+        # (streamed bodies only when the client declared their hash)
+        checkpoint_key = f'upload-{content_sha}' if content_sha else None
+        done = checkpoints.open(checkpoint_key, {'engine': engine}) if checkpoint_key else []
+        if done is None:
+            # Another run of the same upload holds its checkpoint: transcribe without one
+            checkpoint_key, done = None, []
+        resume_at = done[-1]['end'] if done else 0
+        if done:
+            yield {'progress': 15, 'message': f'↩️ Resuming from {format_timestamp(resume_at)}...'}
+        
+        chunks = stream_speech_chunks(file_path if upload_stream is None else upload_stream, start_seconds=resume_at)
+        yield {'progress': 20, 'message': 'Detecting speech segments...'}
+        pause(0.3)
+        
+        transcriptions = []
+        for chunk in done:
+            if chunk['text'].strip():
+                transcriptions.append(chunk['text'])
+                yield {'progress': 20, 'partial_text': chunk['text']}
+        
+        try:
+            for start, end, text in transcribe_chunks(chunks, engine=engine):
+                if checkpoint_key:
+                    checkpoints.append(checkpoint_key, start, end, text or '')
+                resume_at = end
                 
-                transcriptions.append({
-                    'time': f"{minutes:02d}:{seconds:02d}",
-                    'text': combined_text
-                })
+                if upload_stream is not None:
+                    progress = 20 + int(upload_stream.fraction() * 70)
+                else:
+                    progress = 20 + int(min(start / duration_seconds, 1) * 70) if duration_seconds else 20
                 
-                # Start new segment
-                current_segment = {
-                    'start_seconds': segment_start,
-                    'texts': [caption['text']]
-                }
-            else:
-                # Add to current segment
-                if segment_start == current_segment['start_seconds']:
-                    current_segment['texts'].append(caption['text'])
+                if text and text.strip():
+                    transcriptions.append(text)
+                    # Send partial result immediately
+                    yield {'progress': progress, 'partial_text': text}
+                
+                if duration_seconds:
+                    yield {'progress': progress, 'message': f'Transcribing... {format_timestamp(start)} / {format_timestamp(duration_seconds)}'}
                 else:
-                    # First caption
-                    current_segment = {
-                        'start_seconds': segment_start,
-                        'texts': [caption['text']]
-                    }
+                    yield {'progress': progress, 'message': f'Transcribing... {format_timestamp(start)}'}
+        except sr.RequestError as e:
+            if checkpoint_key:
+                yield {'progress': 100, 'error': f'API error: {str(e)} (progress saved, upload the same file again to resume from {format_timestamp(resume_at)})'}
+            else:
+                yield {'progress': 100, 'error': f'API error: {str(e)}'}
+            return
+        
+        yield {'progress': 95, 'message': 'Finalizing transcription...'}
+        pause(0.3)
+        
+        if checkpoint_key:
+            checkpoints.clear(checkpoint_key)
+        
+        sha = upload_stream.hexdigest() if upload_stream is not None else content_sha
+        if content_sha and sha != content_sha:
+            # A declared hash that doesn't match the body must not poison the cache
+            print(f"Upload hash mismatch: declared {content_sha}, received {sha}")
+        elif transcriptions and sha:
+            transcript_cache.put(f'upload:{sha}', TRANSCRIPT_LANGUAGE, 'audio', None, transcriptions)
         
-        # Don't forget the last segment
-        if current_segment['texts']:
-            combined_text = ' '.join(current_segment['texts'])
-            minutes = int(current_segment['start_seconds'] // 60)
-            seconds = int(current_segment['start_seconds'] % 60)
+        if transcriptions:
+            full_transcription = ' '.join(transcriptions)
+            yield {'progress': 100, 'message': 'Complete!', 'transcription': full_transcription}
+        else:
+            yield {'progress': 100, 'error': 'Could not transcribe any part of the audio.'}
             
-            transcriptions.append({
-                'time': f"{minutes:02d}:{seconds:02d}",
-                'text': combined_text
-            })
+    except Exception as e:
+        yield {'progress': 100, 'error': f'Error: {str(e)}'}
+    
+    finally:
+        # Cleanup, also when the stream stops early
+        if checkpoint_key:
+            checkpoints.release(checkpoint_key)
+        if upload_stream is None:
+            remove_upload(file_path)
+
+def expand_batch_urls(urls):
+    """Yield video URLs, expanding any playlist URL into its entries"""
+    for url in urls:
+        if extract_video_id(url) and 'list=' not in url:
+            yield url
+            continue
         
-        return transcriptions
+        with pooled_ydl('playlist') as ydl:
+            info = ydl.extract_info(url, download=False)
+        for entry in info.get('entries') or []:
+            if entry and entry.get('id'):
+                yield f"https://www.youtube.com/watch?v={entry['id']}"
+
+def batch_caption_result(youtube_url, languages, refresh=False, audio_fallback=False, engine=RECOGNIZER_ENGINE):
+    """Fetch caption tracks of one video for every requested language.
+
+    Cached languages are served from the transcript cache, the rest are
+    downloaded in parallel on caption_fetch_pool. Videos without any caption
+    track can be queued as an audio transcription job.
+    """
+    video_id = extract_video_id(youtube_url)
+    result = {'url': youtube_url, 'video_id': video_id, 'video_title': 'Unknown', 'captions': {}, 'missing': []}
+    
+    pending = []
+    for language in languages:
+        cached = None if refresh else transcript_cache.get(video_id, language, sources=('captions',))
+        if not refresh:
+            metrics.inc('namor_cache_requests_total', result='hit' if cached else 'miss')
+        if cached:
+            result['video_title'] = cached['video_title']
+            result['captions'][language] = cached['transcriptions']
+        else:
+            pending.append(language)
+    
+    if pending:
+        with metrics.span('extract_info'), pooled_ydl('metadata') as ydl:
+            info = ydl.extract_info(youtube_url, download=False, process=False)
+        result['video_title'] = info.get('title', 'Unknown')
         
+        futures = {}
+        for language in pending:
+            track_url, automatic = find_caption_track(info, language)
+            if track_url:
+                futures[language] = caption_fetch_pool.submit(fetch_caption_track, track_url, automatic=automatic)
+            else:
+                result['missing'].append(language)
+        
+        for language, future in futures.items():
+            transcriptions = future.result()
+            if not transcriptions:
+                # An empty track is no transcript; caching it would hide the audio fallback
+                result['missing'].append(language)
+                continue
+            for item in transcriptions:
+                item['source'] = 'caption'
+            store_transcript(video_id, language, 'captions', result['video_title'], transcriptions)
+            result['captions'][language] = transcriptions
+    
+    if not result['captions'] and audio_fallback:
+        result['job_id'] = job_manager.submit('youtube', youtube_transcription_events, youtube_url=youtube_url,
+                                              video_id=video_id, refresh=refresh, fast=True, language=languages[0],
+                                              engine=engine)
+    return result
+
+@metrics.instrument_events('batch')
+def batch_transcription_events(urls, languages, refresh=False, audio_fallback=False, engine=RECOGNIZER_ENGINE):
+    """Process a batch of videos concurrently, yielding one event per video as it completes"""
+    yield {'progress': 2, 'message': 'Resolving videos...'}
+    
+    try:
+        video_urls = list(dict.fromkeys(expand_batch_urls(urls)))
     except Exception as e:
-        print(f"Error parsing VTT file: {str(e)}")
-        return []
+        yield {'progress': 100, 'error': f'Error: {str(e)}'}
+        return
+    
+    total = len(video_urls)
+    if not total:
+        yield {'progress': 100, 'error': 'No videos found.'}
+        return
+    
+    yield {'progress': 5, 'message': f'Processing {total} videos...', 'total': total}
+    
+    executor = ThreadPoolExecutor(max_workers=max(1, BATCH_WORKERS))
+    try:
+        futures = {
+            executor.submit(batch_caption_result, url, languages, refresh, audio_fallback, engine): url
+            for url in video_urls
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                video = future.result()
+            except Exception as e:
+                url = futures[future]
+                video = {'url': url, 'video_id': extract_video_id(url), 'error': str(e)}
+            yield {'progress': 5 + int((done / total) * 90), 'message': f'Processed {done}/{total} videos', 'video': video}
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    yield {'progress': 100, 'message': 'Complete!', 'total': total}
 
 @app.route('/transcribeYoutube', methods=['POST'])
 def transcribe_youtube():
@@ -172,370 +1463,180 @@ def transcribe_youtube():
     if not video_id:
         return jsonify({'error': 'Invalid YouTube URL'}), 400
     
-    def generate():
-        audio_path = None
-        subtitle_path = None
-        try:
-            yield f"data: {json.dumps({'progress': 5, 'message': 'Validating YouTube URL...'})}\n\n"
-            time.sleep(0.3)
-            
-            yield f"data: {json.dumps({'progress': 10, 'message': 'Checking for available captions...'})}\n\n"
-            
-            output_path = os.path.join(UPLOAD_FOLDER, f'{video_id}')
-            
-            # First, try to get captions/subtitles
-# First, try to get captions/subtitles
-            subtitle_opts = {
-                'skip_download': True,
-                'writesubtitles': True,
-                'writeautomaticsub': True,
-                'subtitleslangs': ['en', 'en-US', 'en-GB'],
-                'subtitlesformat': 'vtt',
-                'outtmpl': output_path,
-                'quiet': True,
-                'no_warnings': True,
-                'nocheckcertificate': True,
-                'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
-                'extractor_args': {
-                    'youtube': {
-                        'player_client': ['android', 'web', 'ios'],
-                        'skip': ['dash', 'hls']
-                    }
-                },
-                'http_headers': {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                    'Accept-Language': 'en-us,en;q=0.5',
-                    'Sec-Fetch-Mode': 'navigate',
-                    'Referer': 'https://www.youtube.com/',
-                },
-                'cookiefile': None,
-                'age_limit': None,
-            }
-            
-            has_subtitles = False
-            video_title = 'Unknown'
-            
-            with yt_dlp.YoutubeDL(subtitle_opts) as ydl:
-                try:
-                    info = ydl.extract_info(youtube_url, download=False)
-                    video_title = info.get('title', 'Unknown')
-                    
-                    # Check for subtitles
-                    subtitles = info.get('subtitles', {})
-                    automatic_captions = info.get('automatic_captions', {})
-                    
-                    if subtitles or automatic_captions:
-                        yield f"data: {json.dumps({'progress': 15, 'message': '✅ Captions found! Downloading...', 'video_title': video_title})}\n\n"
-                        
-                        # Download subtitles
-                        ydl.download([youtube_url])
-                        
-                        # Find downloaded subtitle file
-                        possible_extensions = ['.en.vtt', '.en-US.vtt', '.en-GB.vtt']
-                        for ext in possible_extensions:
-                            potential_path = output_path + ext
-                            if os.path.exists(potential_path):
-                                subtitle_path = potential_path
-                                has_subtitles = True
-                                break
-                        
-                        if has_subtitles:
-                            yield f"data: {json.dumps({'progress': 30, 'message': 'Processing captions...', 'video_title': video_title})}\n\n"
-                            time.sleep(0.3)
-                            
-                            # Parse VTT file
-                            transcriptions = parse_vtt_file(subtitle_path)
-                            
-                            yield f"data: {json.dumps({'progress': 50, 'message': 'Formatting transcription...'})}\n\n"
-                            
-                            # Send partial results ONE AT A TIME for smooth typing animation
-                            for idx, item in enumerate(transcriptions):
-                                progress = 50 + int((idx / len(transcriptions)) * 40)
-                                # Mark as caption source for faster typing
-                                item['source'] = 'caption'
-                                yield f"data: {json.dumps({'progress': progress, 'partial': item})}\n\n"
-                                # Longer delay so typing animation has time to complete each segment
-                                time.sleep(0.5)
-                            
-                            yield f"data: {json.dumps({'progress': 95, 'message': '✅ Captions transcribed successfully!'})}\n\n"
-                            time.sleep(0.3)
-                            
-                            yield f"data: {json.dumps({'progress': 100, 'message': 'Complete!', 'transcriptions': transcriptions, 'video_title': video_title, 'source': 'captions'})}\n\n"
-                            
-                            # Cleanup
-                            if subtitle_path and os.path.exists(subtitle_path):
-                                os.remove(subtitle_path)
-                            return
-                    else:
-                        yield f"data: {json.dumps({'progress': 15, 'message': 'ℹ️ No captions found. Using speech-to-text...', 'video_title': video_title})}\n\n"
-                        
-                except Exception as e:
-                    yield f"data: {json.dumps({'progress': 15, 'message': 'ℹ️ Caption check failed. Using speech-to-text...', 'video_title': video_title})}\n\n"
-            
-            # Fallback to audio transcription if no subtitles
-            yield f"data: {json.dumps({'progress': 20, 'message': 'Downloading audio from YouTube...'})}\n\n"
-            
-            ydl_opts = {
-                'format': 'bestaudio/best',
-                'outtmpl': output_path,
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'wav',
-                }],
-                'quiet': True,
-                'no_warnings': True,
-                'nocheckcertificate': True,
-                'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'extractor_args': {'youtube': {'player_client': ['android', 'web']}},
-                'http_headers': {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                    'Accept-Language': 'en-us,en;q=0.5',
-                    'Sec-Fetch-Mode': 'navigate',
-                }
-            }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                if not video_title or video_title == 'Unknown':
-                    info = ydl.extract_info(youtube_url, download=True)
-                    video_title = info.get('title', 'Unknown')
-                else:
-                    ydl.download([youtube_url])
-            
-            audio_path = output_path + '.wav'
-            
-            yield f"data: {json.dumps({'progress': 35, 'message': f'Downloaded: {video_title}', 'video_title': video_title})}\n\n"
-            time.sleep(0.3)
-            
-            # Load audio and prepare for transcription
-            yield f"data: {json.dumps({'progress': 40, 'message': 'Loading audio file...'})}\n\n"
-            
-            recognizer = sr.Recognizer()
-            recognizer.energy_threshold = 300
-            recognizer.dynamic_energy_threshold = True
-            
-            # Load audio file
-            audio = AudioSegment.from_wav(audio_path)
-            duration_seconds = len(audio) / 1000.0
-            
-            yield f"data: {json.dumps({'progress': 45, 'message': f'Duration: {int(duration_seconds//60)}m {int(duration_seconds%60)}s'})}\n\n"
-            time.sleep(0.3)
-            
-            # Split into chunks (30 seconds each)
-            chunk_length_ms = 30000
-            chunks = []
-            
-            for i in range(0, len(audio), chunk_length_ms):
-                chunk = audio[i:i + chunk_length_ms]
-                chunks.append(chunk)
-            
-            total_chunks = len(chunks)
-            yield f"data: {json.dumps({'progress': 50, 'message': f'Split into {total_chunks} segments'})}\n\n"
-            time.sleep(0.3)
-            
-            # Transcribe each chunk
-            transcriptions = []
-            chunk_temp_path = os.path.join(UPLOAD_FOLDER, f'{video_id}_chunk.wav')
-            
-            for idx, chunk in enumerate(chunks):
-                # Calculate progress (50% to 90% for processing)
-                progress = 50 + int((idx / total_chunks) * 40)
-                yield f"data: {json.dumps({'progress': progress, 'message': f'Transcribing segment {idx + 1}/{total_chunks}...'})}\n\n"
-                
-                # Export chunk
-                chunk.export(chunk_temp_path, format='wav')
-                
-                # Transcribe
-                try:
-                    with sr.AudioFile(chunk_temp_path) as source:
-                        recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                        audio_data = recognizer.record(source)
-                        
-                        try:
-                            text = recognizer.recognize_google(audio_data, language='en-US')
-                            if text.strip():
-                                # Add timestamp
-                                timestamp = idx * 30
-                                minutes = timestamp // 60
-                                seconds = timestamp % 60
-                                transcriptions.append({
-                                    'time': f"{minutes:02d}:{seconds:02d}",
-                                    'text': text
-                                })
-                                # Send partial result immediately
-                                yield f"data: {json.dumps({'progress': progress, 'partial': {'time': f'{minutes:02d}:{seconds:02d}', 'text': text}})}\n\n"
-                        except sr.UnknownValueError:
-                            pass
-                        except sr.RequestError as e:
-                            yield f"data: {json.dumps({'progress': 100, 'error': f'API error: {str(e)}'})}\n\n"
-                            return
-                            
-                except Exception as e:
-                    print(f"Error processing chunk {idx}: {str(e)}")
-                    continue
-            
-            # Cleanup
-            try:
-                os.remove(chunk_temp_path)
-            except:
-                pass
-            
-            yield f"data: {json.dumps({'progress': 95, 'message': 'Finalizing transcription...'})}\n\n"
-            time.sleep(0.3)
-            
-            if transcriptions:
-                yield f"data: {json.dumps({'progress': 100, 'message': 'Complete!', 'transcriptions': transcriptions, 'video_title': video_title, 'source': 'audio'})}\n\n"
-            else:
-                yield f"data: {json.dumps({'progress': 100, 'error': 'Could not transcribe audio. The video might not contain clear speech.'})}\n\n"
-                
-        except Exception as e:
-            yield f"data: {json.dumps({'progress': 100, 'error': f'Error: {str(e)}'})}\n\n"
-        
-        # Cleanup
-        if audio_path and os.path.exists(audio_path):
-            try:
-                os.remove(audio_path)
-            except:
-                pass
-        if subtitle_path and os.path.exists(subtitle_path):
-            try:
-                os.remove(subtitle_path)
-            except:
-                pass
+    engine = requested_engine(data)
+    if not recognizers.is_available(engine):
+        return jsonify({'error': f'Recognizer engine not available: {engine}'}), 400
     
-    return Response(generate(), mimetype='text/event-stream')
+    try:
+        start, end = parse_time_range(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    refresh = bool(data.get('refresh'))
+    language = data.get('language') or TRANSCRIPT_LANGUAGE
+    metrics.inc('namor_requests_total', kind='youtube')
+    events = youtube_transcription_events(youtube_url, video_id, refresh=refresh, fast=is_fast_mode(data),
+                                          language=language, engine=engine, start=start, end=end)
+    return event_stream_response(events, data)
+
+@app.route('/transcribeBatch', methods=['POST'])
+def transcribe_batch():
+    """Fetch captions for a list of video/playlist URLs in any set of languages"""
+    data = request.get_json(silent=True) or {}
+    urls = data.get('urls') or []
+    if data.get('playlist'):
+        urls = urls + [data['playlist']]
+    languages = data.get('languages') or [TRANSCRIPT_LANGUAGE]
+    
+    if not isinstance(urls, list) or not urls:
+        return jsonify({'error': 'No URLs provided'}), 400
+    if not isinstance(languages, list):
+        return jsonify({'error': 'languages must be a list'}), 400
+    
+    engine = requested_engine(data)
+    if not recognizers.is_available(engine):
+        return jsonify({'error': f'Recognizer engine not available: {engine}'}), 400
+    
+    metrics.inc('namor_requests_total', kind='batch')
+    events = batch_transcription_events(urls, languages, refresh=bool(data.get('refresh')),
+                                        audio_fallback=bool(data.get('audio_fallback')), engine=engine)
+    return event_stream_response(events, data)
 
 @app.route('/uploadAudio', methods=['POST'])
 def upload_audio():
-    if 'audio' not in request.files:
-        return jsonify({'error': 'No audio file provided'}), 400
+    """Transcribe an upload: multipart form with an 'audio' file, or the raw file as the request
+    body (name in ?filename= or an X-Filename header) which is decoded while it arrives"""
+    engine = requested_engine()
+    if not recognizers.is_available(engine):
+        return jsonify({'error': f'Recognizer engine not available: {engine}'}), 400
+    fast = is_fast_mode()
     
-    file = request.files['audio']
-    if file.filename == '':
-        return jsonify({'error': 'No selected file'}), 400
+    upload_stream = None
+    if request.mimetype == 'multipart/form-data':
+        if 'audio' not in request.files:
+            return jsonify({'error': 'No audio file provided'}), 400
+        
+        file = request.files['audio']
+        if file.filename == '':
+            return jsonify({'error': 'No selected file'}), 400
+        
+        file_path, sha = store_upload(file.stream, file.filename)
+    else:
+        filename = os.path.basename(request.args.get('filename') or request.headers.get('X-Filename', ''))
+        if not filename:
+            return jsonify({'error': 'No audio file provided'}), 400
+        
+        if os.path.splitext(filename)[1].lower() in SEEKABLE_UPLOAD_FORMATS:
+            # Written once in blocks, then decoded from disk like a form upload
+            file_path, sha = store_upload(request.stream, filename)
+        else:
+            # Decoded as it arrives; an X-Content-SHA256 header lets duplicates be recognized up front
+            sha = request.headers.get('X-Content-SHA256', '').lower() or None
+            if sha and not SHA256_RE.match(sha):
+                return jsonify({'error': 'Invalid X-Content-SHA256 header'}), 400
+            file_path = os.path.join(UPLOAD_FOLDER, filename)
+            upload_stream = UploadStream(request.stream, request.content_length)
     
-    file_path = os.path.join(UPLOAD_FOLDER, file.filename)
-    file.save(file_path)
+    metrics.inc('namor_requests_total', kind='upload')
+    events_fn = functools.partial(upload_transcription_events, file_path, fast=fast, engine=engine,
+                                  upload_stream=upload_stream, content_sha=sha)
+    if sha:
+        # Identical uploads in flight share one run (a later duplicate's body is never read,
+        # and its stored copy is dropped)
+        on_join = functools.partial(remove_upload, file_path) if upload_stream is None else None
+        events = shared_uploads.events((sha, engine, fast), events_fn, on_join)
+    else:
+        events = events_fn()
+    return event_stream_response(events)
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue a transcription job: JSON {"url": ...} for YouTube or a form upload with an 'audio' file"""
+    data = request.get_json(silent=True) or {}
+    engine = requested_engine(data)
+    if not recognizers.is_available(engine):
+        return jsonify({'error': f'Recognizer engine not available: {engine}'}), 400
     
-    # Video formats that need audio extraction
-    video_formats = ['.mp4', '.avi', '.mkv', '.mov', '.flv', '.wmv', '.webm', '.m4v', '.mpeg', '.mpg', '.3gp']
-    audio_formats = ['.mp3', '.wav', '.m4a', '.aac', '.ogg', '.flac', '.wma']
+    if 'audio' in request.files:
+        file = request.files['audio']
+        if file.filename == '':
+            return jsonify({'error': 'No selected file'}), 400
+        
+        file_path, sha = store_upload(file.stream, file.filename)
+        
+        # An identical upload that is still queued or running is shared instead of started again
+        with upload_jobs_lock:
+            job_id = upload_jobs.get((sha, engine))
+            state = job_manager.status(job_id) if job_id else None
+            if state is None or state['state'] in FINISHED_STATES:
+                job_id = job_manager.submit('upload', upload_transcription_events, file_path=file_path, fast=True,
+                                            engine=engine, content_sha=sha)
+                upload_jobs[(sha, engine)] = job_id
+            else:
+                remove_upload(file_path)
+    else:
+        youtube_url = data.get('url', '')
+        if not youtube_url:
+            return jsonify({'error': 'No URL or audio file provided'}), 400
+        
+        video_id = extract_video_id(youtube_url)
+        if not video_id:
+            return jsonify({'error': 'Invalid YouTube URL'}), 400
+        
+        try:
+            start, end = parse_time_range(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        job_id = job_manager.submit('youtube', youtube_transcription_events, youtube_url=youtube_url,
+                                    video_id=video_id, refresh=bool(data.get('refresh')), fast=True,
+                                    language=data.get('language') or TRANSCRIPT_LANGUAGE, engine=engine,
+                                    start=start, end=end)
     
-    file_ext = os.path.splitext(file.filename)[1].lower()
+    metrics.inc('namor_requests_total', kind='job')
+    return jsonify({
+        'job_id': job_id,
+        'status_url': url_for('job_status', job_id=job_id),
+        'events_url': url_for('job_events', job_id=job_id)
+    }), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    status = job_manager.status(job_id) if JOB_ID_RE.match(job_id) else None
+    if status is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """Stream a job's progress events, replaying from ?after=N or the Last-Event-ID header"""
+    if not JOB_ID_RE.match(job_id) or not job_manager.exists(job_id):
+        return jsonify({'error': 'Unknown job'}), 404
+    
+    after = request.headers.get('Last-Event-ID') or request.args.get('after') or 0
+    try:
+        after = int(after)
+    except ValueError:
+        return jsonify({'error': 'Invalid event ID'}), 400
     
     def generate():
-        file_path_final = None
-        try:
-            wav_path = None
-            
-            # Convert video/audio to WAV
-            if file_ext in video_formats:
-                yield f"data: {json.dumps({'progress': 5, 'message': 'Extracting audio from video...'})}\n\n"
-                time.sleep(0.3)
-                
-                wav_path = file_path.replace(file_ext, '.wav')
-                audio = AudioSegment.from_file(file_path)
-                audio.export(wav_path, format='wav')
-                os.remove(file_path)
-                file_path_final = wav_path
-                
-            elif file_ext in audio_formats:
-                if file_ext != '.wav':
-                    yield f"data: {json.dumps({'progress': 5, 'message': 'Converting audio format...'})}\n\n"
-                    time.sleep(0.3)
-                    
-                    wav_path = file_path.replace(file_ext, '.wav')
-                    audio = AudioSegment.from_file(file_path)
-                    audio.export(wav_path, format='wav')
-                    os.remove(file_path)
-                    file_path_final = wav_path
-                else:
-                    file_path_final = file_path
-            else:
-                yield f"data: {json.dumps({'progress': 100, 'error': 'Unsupported file format. Please upload audio or video files.'})}\n\n"
-                return
-            
-            yield f"data: {json.dumps({'progress': 10, 'message': 'Loading audio file...'})}\n\n"
-            
-            recognizer = sr.Recognizer()
-            recognizer.energy_threshold = 300
-            recognizer.dynamic_energy_threshold = True
-            
-            audio = AudioSegment.from_file(file_path_final)
-            duration_seconds = len(audio) / 1000.0
-            
-            yield f"data: {json.dumps({'progress': 15, 'message': f'Audio duration: {int(duration_seconds//60)}m {int(duration_seconds%60)}s'})}\n\n"
-            time.sleep(0.3)
-            
-            chunk_length_ms = 30000
-            chunks = []
-            
-            for i in range(0, len(audio), chunk_length_ms):
-                chunk = audio[i:i + chunk_length_ms]
-                chunks.append(chunk)
-            
-            total_chunks = len(chunks)
-            yield f"data: {json.dumps({'progress': 20, 'message': f'Split into {total_chunks} segments'})}\n\n"
-            time.sleep(0.3)
-            
-            transcriptions = []
-            chunk_temp_path = file_path_final.replace('.wav', '_chunk.wav')
-            
-            for idx, chunk in enumerate(chunks):
-                progress = 20 + int((idx / total_chunks) * 70)
-                yield f"data: {json.dumps({'progress': progress, 'message': f'Transcribing segment {idx + 1}/{total_chunks}...'})}\n\n"
-                
-                chunk.export(chunk_temp_path, format='wav')
-                
-                try:
-                    with sr.AudioFile(chunk_temp_path) as source:
-                        recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                        audio_data = recognizer.record(source)
-                        
-                        try:
-                            text = recognizer.recognize_google(audio_data, language='en-US')
-                            if text.strip():
-                                transcriptions.append(text)
-                                # Send partial result immediately
-                                yield f"data: {json.dumps({'progress': progress, 'partial_text': text})}\n\n"
-                        except sr.UnknownValueError:
-                            pass
-                        except sr.RequestError as e:
-                            yield f"data: {json.dumps({'progress': 100, 'error': f'API error: {str(e)}'})}\n\n"
-                            return
-                            
-                except Exception as e:
-                    print(f"Error processing chunk {idx}: {str(e)}")
-                    continue
-            
-            try:
-                os.remove(chunk_temp_path)
-            except:
-                pass
-            
-            yield f"data: {json.dumps({'progress': 95, 'message': 'Finalizing transcription...'})}\n\n"
-            time.sleep(0.3)
-            
-            if transcriptions:
-                full_transcription = ' '.join(transcriptions)
-                yield f"data: {json.dumps({'progress': 100, 'message': 'Complete!', 'transcription': full_transcription})}\n\n"
-            else:
-                yield f"data: {json.dumps({'progress': 100, 'error': 'Could not transcribe any part of the audio.'})}\n\n"
-                
-        except Exception as e:
-            yield f"data: {json.dumps({'progress': 100, 'error': f'Error: {str(e)}'})}\n\n"
-        
-        # Cleanup
-        if file_path_final and os.path.exists(file_path_final):
-            try:
-                os.remove(file_path_final)
-            except:
-                pass
+        for seq, event in job_manager.events(job_id, after=after):
+            yield f"id: {seq}\ndata: {json.dumps(event)}\n\n"
     
     return Response(generate(), mimetype='text/event-stream')
 
 if __name__ == '__main__':
+    if '--update-ytdlp' in sys.argv:
+        update_ytdlp()
+        sys.exit(0)
+    
+    # Totals from a previous run's job workers would otherwise be merged in
+    metrics.clear_snapshots(METRICS_FOLDER)
+    
+    # Only the serving process updates, not the debug reloader's watcher
+    if os.environ.get('YTDLP_AUTO_UPDATE') == '1' and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_ytdlp_updater()
+    
     port = 8888
     print('='*50)
     print(f'🚀 N.A.M.O.R. Server Starting...')
@@ -0,0 +1,453 @@
+"""
+ASGI serving mode for N.A.M.O.R.
+Progress streams are coroutines instead of threads. Blocking yt-dlp, decode
+and recognizer work runs on a bounded thread pool and hands its events to
+the event loop, pacing delays are asyncio sleeps, and job event logs are
+tailed asynchronously, so a client that is only waiting costs a coroutine.
+Every other route is served by the Flask app (needs asgiref).
+
+    uvicorn asgi:application --host 0.0.0.0 --port 8888
+"""
+
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import app as namor
+import metrics
+import recognizers
+
+try:
+    from asgiref.sync import sync_to_async
+    from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+except ImportError:
+    WsgiToAsgi = None
+
+ASGI_WORKERS = int(os.environ.get('ASGI_WORKERS', 32))  # Transcriptions running at once; further streams wait as coroutines
+FLASK_WORKERS = int(os.environ.get('ASGI_FLASK_WORKERS', 16))  # Flask-served requests handled at once
+JOB_POLL_INTERVAL = 0.25   # Seconds between reads of a job's event log
+UPLOAD_QUEUE_BLOCKS = 16   # Request body chunks buffered ahead of the decoder
+
+JOB_EVENTS_RE = re.compile(r'^/jobs/([^/]+)/events$')
+
+# Long-running transcriptions only; short file reads use the loop's default executor
+executor = ThreadPoolExecutor(max_workers=ASGI_WORKERS, thread_name_prefix='namor-events')
+flask_executor = ThreadPoolExecutor(max_workers=FLASK_WORKERS, thread_name_prefix='namor-flask')
+
+if WsgiToAsgi:
+    class PooledWsgiToAsgiInstance(WsgiToAsgiInstance):
+        """One WSGI request, run on flask_executor.
+
+        asgiref runs every WSGI request on one shared thread, so a slow Flask
+        response (a multipart upload being transcribed) would stall /health,
+        /metrics, /jobs, ... behind it.
+        """
+
+        async def run_wsgi_app(self, body):
+            # The undecorated method, which asgiref would run with thread_sensitive=True
+            run_sync = WsgiToAsgiInstance.__dict__['run_wsgi_app'].func
+            run = sync_to_async(run_sync, thread_sensitive=False, executor=flask_executor)
+            await run(self, body)
+
+    class PooledWsgiToAsgi(WsgiToAsgi):
+        async def __call__(self, scope, receive, send):
+            await PooledWsgiToAsgiInstance(self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+flask_application = PooledWsgiToAsgi(namor.app) if WsgiToAsgi else None
+
+class Request:
+    """Method, path, query and headers of an HTTP scope"""
+
+    def __init__(self, scope):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.args = {k: v[0] for k, v in parse_qs(scope.get('query_string', b'').decode('latin-1')).items()}
+        self.headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', [])}
+
+    @property
+    def mimetype(self):
+        return self.headers.get('content-type', '').split(';')[0].strip().lower()
+
+    def flag(self, name, data=None):
+        """Same rules as app.request_flag: ?name=1 or "name": true"""
+        value = self.args.get(name)
+        if value is None and data:
+            value = data.get(name)
+        return str(value).lower() in ('1', 'true', 'yes')
+
+    def is_fast_mode(self, data=None):
+        return self.flag('fast', data)
+
+    def stream_options(self, data=None):
+        """(compact, encoding) for an event stream, like app.event_stream_response"""
+        compact = self.flag('compact', data)
+        encoding = namor.accepted_stream_encoding(self.headers.get('accept-encoding', '')) if compact else None
+        return compact, encoding
+
+    def engine(self, data=None):
+        """Same rules as app.requested_engine: ?engine= or "engine", else RECOGNIZER_ENGINE"""
+        return self.args.get('engine') or (data or {}).get('engine') or namor.RECOGNIZER_ENGINE
+
+
+class RequestBody:
+    """Blocking file-like reader over an ASGI request body, for worker threads.
+
+    The event loop puts body chunks into a bounded queue as they arrive
+    (None at the end), so a slow decoder slows down the upload instead of
+    buffering it in memory.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.chunks = asyncio.Queue(UPLOAD_QUEUE_BLOCKS)
+        self.buffer = b''
+        self.finished = False
+
+    def read(self, size=-1):
+        while not self.finished and (size < 0 or not self.buffer):
+            chunk = asyncio.run_coroutine_threadsafe(self.chunks.get(), self.loop).result()
+            if chunk is None:
+                self.finished = True
+            else:
+                self.buffer += chunk
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def close(self):
+        """End the body early, on the event loop: a reader waiting for data gets EOF.
+
+        Unread chunks are dropped, so this works even when the queue is full.
+        """
+        while not self.chunks.empty():
+            self.chunks.get_nowait()
+        self.chunks.put_nowait(None)
+
+
+async def read_body(receive):
+    """Whole request body, or None if the client disconnected first"""
+    body = b''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def pump_body(receive, body):
+    """Feed the request body into a RequestBody, then wait for the client to disconnect"""
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            # A truncated body ends the stream; its hash will not match
+            await body.chunks.put(None)
+            return
+        if message.get('body'):
+            await body.chunks.put(message['body'])
+        if not message.get('more_body'):
+            await body.chunks.put(None)
+            break
+    await wait_for_disconnect(receive)
+
+
+async def send_json(send, payload, status=200):
+    await send({'type': 'http.response.start', 'status': status, 'headers': [
+        (b'content-type', b'application/json'),
+        (b'access-control-allow-origin', b'*'),
+    ]})
+    await send({'type': 'http.response.body', 'body': json.dumps(payload).encode('utf-8') + b'\n'})
+
+
+async def start_event_stream(send, encoding=None):
+    headers = [
+        (b'content-type', b'text/event-stream; charset=utf-8'),
+        (b'cache-control', b'no-cache'),
+        (b'access-control-allow-origin', b'*'),
+        (b'vary', b'Accept-Encoding'),
+    ]
+    if encoding:
+        headers.append((b'content-encoding', encoding.encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+
+
+async def stream_events(send, disconnected, events_fn, compact=False, encoding=None):
+    """Send events_fn()'s events as Server-Sent Events until it ends or the client leaves.
+
+    events_fn runs on the worker pool. Its display pauses (non-fast clients)
+    arrive as app.Pause values and are waited out here, like the batching of
+    compact streams, without holding a thread.
+    """
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    stopped = threading.Event()
+    put = lambda event: loop.call_soon_threadsafe(events.put_nowait, event)
+    loop.run_in_executor(executor, namor.run_events, events_fn(), put, stopped, True)
+
+    compactor = namor.CompactEvents() if compact else None
+    compressor = namor.stream_compressor(encoding)
+
+    async def emit(event):
+        data = namor.format_sse(event, compact).encode('utf-8')
+        if compressor:
+            data = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        await send({'type': 'http.response.body', 'body': data, 'more_body': True})
+
+    await start_event_stream(send, encoding)
+    try:
+        while True:
+            get = asyncio.ensure_future(events.get())
+            timeout = compactor.flush_due_in() if compactor else None
+            await asyncio.wait({get, disconnected}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not get.done():
+                get.cancel()
+                if disconnected.done():
+                    return
+                # Flush interval passed while the generator is busy
+                for event in compactor.flush():
+                    await emit(event)
+                continue
+            event = get.result()
+            if event is namor.EVENTS_END:
+                break
+            if isinstance(event, namor.Pause):
+                # Whatever is batched goes out before the pause
+                for batched in (compactor.flush() if compactor else []):
+                    await emit(batched)
+                await asyncio.wait({disconnected}, timeout=event)
+                if disconnected.done():
+                    return
+                continue
+            for event in (compactor.add(event) if compactor else [event]):
+                await emit(event)
+        for event in (compactor.flush() if compactor else []):
+            await emit(event)
+        await send({'type': 'http.response.body', 'body': compressor.flush() if compressor else b''})
+    finally:
+        stopped.set()
+        disconnected.cancel()
+
+
+async def transcribe_youtube(request, receive, send):
+    body = await read_body(receive)
+    if body is None:
+        return
+    try:
+        data = json.loads(body or b'{}')
+    except ValueError:
+        return await send_json(send, {'error': 'Invalid JSON body'}, 400)
+    if not isinstance(data, dict):
+        return await send_json(send, {'error': 'Invalid JSON body'}, 400)
+
+    youtube_url = data.get('url', '')
+    if not youtube_url:
+        return await send_json(send, {'error': 'No URL provided'}, 400)
+
+    video_id = namor.extract_video_id(youtube_url)
+    if not video_id:
+        return await send_json(send, {'error': 'Invalid YouTube URL'}, 400)
+
+    engine = request.engine(data)
+    if not recognizers.is_available(engine):
+        return await send_json(send, {'error': f'Recognizer engine not available: {engine}'}, 400)
+
+    try:
+        start, end = namor.parse_time_range(data)
+    except ValueError as e:
+        return await send_json(send, {'error': str(e)}, 400)
+
+    metrics.inc('namor_requests_total', kind='youtube')
+    events_fn = lambda: namor.youtube_transcription_events(
+        youtube_url, video_id, refresh=bool(data.get('refresh')), fast=request.is_fast_mode(data),
+        language=data.get('language') or namor.TRANSCRIPT_LANGUAGE, engine=engine, start=start, end=end)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    await stream_events(send, disconnected, events_fn, *request.stream_options(data))
+
+
+async def transcribe_batch(request, receive, send):
+    body = await read_body(receive)
+    if body is None:
+        return
+    try:
+        data = json.loads(body or b'{}')
+    except ValueError:
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+
+    urls = data.get('urls') or []
+    if data.get('playlist'):
+        urls = urls + [data['playlist']]
+    languages = data.get('languages') or [namor.TRANSCRIPT_LANGUAGE]
+
+    if not isinstance(urls, list) or not urls:
+        return await send_json(send, {'error': 'No URLs provided'}, 400)
+    if not isinstance(languages, list):
+        return await send_json(send, {'error': 'languages must be a list'}, 400)
+
+    engine = request.engine(data)
+    if not recognizers.is_available(engine):
+        return await send_json(send, {'error': f'Recognizer engine not available: {engine}'}, 400)
+
+    metrics.inc('namor_requests_total', kind='batch')
+    events_fn = lambda: namor.batch_transcription_events(
+        urls, languages, refresh=bool(data.get('refresh')), audio_fallback=bool(data.get('audio_fallback')),
+        engine=engine)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    await stream_events(send, disconnected, events_fn, *request.stream_options(data))
+
+
+async def spool_upload(receive, filename):
+    """Async version of app.store_upload for a raw request body.
+
+    Returns (path, sha256), or None if the client disconnected mid-upload.
+    """
+    digest = hashlib.sha256()
+    tmp_path = os.path.join(namor.UPLOAD_FOLDER, f'.{uuid.uuid4().hex}.part')
+    with open(tmp_path, 'wb') as f:
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                f.close()
+                os.remove(tmp_path)
+                return None
+            block = message.get('body', b'')
+            digest.update(block)
+            f.write(block)
+            if not message.get('more_body'):
+                break
+    sha = digest.hexdigest()
+    path = namor.stored_upload_path(sha, filename)
+    os.replace(tmp_path, path)
+    return path, sha
+
+
+async def upload_audio(request, receive, send):
+    """Raw-body uploads (multipart forms go to Flask), with the same rules as app.upload_audio"""
+    engine = request.engine()
+    if not recognizers.is_available(engine):
+        return await send_json(send, {'error': f'Recognizer engine not available: {engine}'}, 400)
+    fast = request.is_fast_mode()
+
+    filename = os.path.basename(request.args.get('filename') or request.headers.get('x-filename', ''))
+    if not filename:
+        return await send_json(send, {'error': 'No audio file provided'}, 400)
+
+    upload_stream = None
+    if os.path.splitext(filename)[1].lower() in namor.SEEKABLE_UPLOAD_FORMATS:
+        stored = await spool_upload(receive, filename)
+        if stored is None:
+            return
+        file_path, sha = stored
+        disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    else:
+        sha = request.headers.get('x-content-sha256', '').lower() or None
+        if sha and not namor.SHA256_RE.match(sha):
+            return await send_json(send, {'error': 'Invalid X-Content-SHA256 header'}, 400)
+        file_path = os.path.join(namor.UPLOAD_FOLDER, filename)
+        body = RequestBody(asyncio.get_running_loop())
+        content_length = request.headers.get('content-length')
+        upload_stream = namor.UploadStream(body, int(content_length) if content_length else None)
+        disconnected = asyncio.ensure_future(pump_body(receive, body))
+
+    metrics.inc('namor_requests_total', kind='upload')
+
+    upload_events = functools.partial(namor.upload_transcription_events, file_path, fast=fast, engine=engine,
+                                      upload_stream=upload_stream, content_sha=sha)
+    if sha:
+        # Shared with identical uploads in flight, including ones served by Flask (a shared
+        # run is paced on its own thread, as there)
+        on_join = functools.partial(namor.remove_upload, file_path) if upload_stream is None else None
+        events_fn = functools.partial(namor.shared_uploads.events, (sha, engine, fast), upload_events, on_join)
+    else:
+        events_fn = upload_events
+
+    try:
+        await stream_events(send, disconnected, events_fn, *request.stream_options())
+    finally:
+        if upload_stream is not None:
+            # pump_body is cancelled with the stream; don't leave a decoder thread waiting for the body
+            body.close()
+
+
+async def job_events(request, receive, send, job_id):
+    """Async tail of a job's event log, replaying from ?after=N or the Last-Event-ID header"""
+    job_manager = namor.job_manager
+    if not namor.JOB_ID_RE.match(job_id) or not job_manager.exists(job_id):
+        return await send_json(send, {'error': 'Unknown job'}, 404)
+
+    try:
+        after = int(request.headers.get('last-event-id') or request.args.get('after') or 0)
+    except ValueError:
+        return await send_json(send, {'error': 'Invalid event ID'}, 400)
+
+    loop = asyncio.get_running_loop()
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    await start_event_stream(send)
+    position = seq = 0
+    try:
+        while not disconnected.done():
+            events, position, seq, finished = await loop.run_in_executor(
+                None, job_manager.poll_events, job_id, position, seq)
+            for event_seq, event in events:
+                if event_seq > after:
+                    await send({'type': 'http.response.body', 'more_body': True,
+                                'body': f'id: {event_seq}\ndata: {json.dumps(event)}\n\n'.encode('utf-8')})
+            if finished:
+                await send({'type': 'http.response.body', 'body': b''})
+                return
+            await asyncio.wait({disconnected}, timeout=JOB_POLL_INTERVAL)
+    finally:
+        disconnected.cancel()
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Totals from a previous run's job workers would otherwise be merged in
+            metrics.clear_snapshots(namor.METRICS_FOLDER)
+            if os.environ.get('YTDLP_AUTO_UPDATE') == '1':
+                namor.start_ytdlp_updater()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            executor.shutdown(wait=False, cancel_futures=True)
+            flask_executor.shutdown(wait=False, cancel_futures=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """ASGI entry point: streaming routes natively, everything else through Flask"""
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+
+    request = Request(scope)
+    if request.method == 'POST' and request.path == '/transcribeYoutube':
+        return await transcribe_youtube(request, receive, send)
+    if request.method == 'POST' and request.path == '/transcribeBatch':
+        return await transcribe_batch(request, receive, send)
+    if request.method == 'POST' and request.path == '/uploadAudio' and request.mimetype != 'multipart/form-data':
+        return await upload_audio(request, receive, send)
+    match = JOB_EVENTS_RE.match(request.path)
+    if request.method == 'GET' and match:
+        return await job_events(request, receive, send, match.group(1))
+
+    if flask_application is None:
+        return await send_json(send, {'error': 'Install asgiref to serve this route in ASGI mode'}, 501)
+    await flask_application(scope, receive, send)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+N.A.M.O.R. Audio Chunking Benchmark
+Generates a long speech-like WAV and times the decode and chunking path:
+ffmpeg decode to 16 kHz PCM, energy VAD and export of the speech chunks
+sent to the recognizer. Needs ffmpeg on the PATH.
+
+Usage: python benchmarks/bench_audio.py [minutes]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import RECOGNIZER_SAMPLE_RATE, VAD_FRAME_MS, ffmpeg_pcm_blocks, frame_rms, stream_speech_chunks
+
+SAMPLE_RATE = 44100  # Typical upload rate, so decoding includes resampling
+
+
+def write_speech_wav(path, minutes, seed=25):
+    """Write a mono 16-bit WAV of 1-8 s "utterances" (modulated tones) separated by 0.3-2 s of low noise"""
+    rng = np.random.default_rng(seed)
+    total = int(minutes * 60 * SAMPLE_RATE)
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        written = 0
+        while written < total:
+            pause = int(rng.uniform(0.3, 2.0) * SAMPLE_RATE)
+            speech = int(rng.uniform(1.0, 8.0) * SAMPLE_RATE)
+            t = np.arange(speech) / SAMPLE_RATE
+            envelope = 0.5 + 0.5 * np.sin(2 * np.pi * rng.uniform(2, 5) * t)
+            voice = np.sin(2 * np.pi * rng.uniform(120, 250) * t) * envelope * rng.uniform(3000, 9000)
+            samples = np.concatenate([rng.normal(0, 60, pause), voice + rng.normal(0, 60, speech)])
+            samples = samples[:total - written]
+            f.writeframes(np.clip(samples, -32768, 32767).astype('<i2').tobytes())
+            written += len(samples)
+
+
+def decode(path):
+    return sum(len(block) for block in ffmpeg_pcm_blocks(path))
+
+
+def chunk(path):
+    return list(stream_speech_chunks(path))
+
+
+def export(chunks):
+    return sum(len(audio_data.get_wav_data()) for _, audio_data in chunks)
+
+
+def cases(workdir):
+    """Benchmarks for benchmarks/run.py (none without ffmpeg)"""
+    if shutil.which('ffmpeg') is None:
+        print('bench_audio: ffmpeg not found, skipping audio benchmarks')
+        return []
+    path = os.path.join(workdir, 'speech_10min.wav')
+    write_speech_wav(path, 10)
+    pcm = np.frombuffer(b''.join(ffmpeg_pcm_blocks(path)), dtype='<i2')
+    frame_length = int(RECOGNIZER_SAMPLE_RATE * VAD_FRAME_MS / 1000)
+    chunks = chunk(path)
+    return [
+        ('audio.decode_10min', lambda: decode(path)),
+        ('audio.frame_rms_10min', lambda: frame_rms(pcm, frame_length)),
+        ('audio.speech_chunks_10min', lambda: chunk(path)),
+        ('audio.export_chunks_10min', lambda: export(chunks)),
+    ]
+
+
+def main():
+    minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'speech.wav')
+        write_speech_wav(path, minutes)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+
+        start = time.perf_counter()
+        chunks = chunk(path)
+        chunk_time = time.perf_counter() - start
+        start = time.perf_counter()
+        export(chunks)
+        export_time = time.perf_counter() - start
+
+        print(f"{minutes:g} min WAV ({size_mb:.1f} MB): decode + VAD {chunk_time * 1000:.0f} ms "
+              f"({len(chunks)} chunks), WAV export {export_time * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+N.A.M.O.R. SSE Serialization Benchmark
+Times turning a long caption transcript's progress events into Server-Sent
+Events: one JSON event per segment, the compact protocol and gzip.
+
+Usage: python benchmarks/bench_sse.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import CompactEvents, format_sse, format_timestamp, sse_stream
+
+WORDS = ['the', 'lecture', 'today', 'covers', 'dynamic', 'programming', 'and', 'how',
+         'we', 'can', 'reuse', 'results', 'from', 'smaller', 'subproblems', 'to', 'solve']
+
+
+def generate_events(segments):
+    """Events of a caption transcript: one partial per 30 s segment, then the full result"""
+    transcriptions = [{
+        'time': format_timestamp(i * 30),
+        'text': ' '.join(WORDS[(i + j) % len(WORDS)] for j in range(70)),
+        'source': 'caption',
+    } for i in range(segments)]
+    events = [{'progress': 50 + int(i / segments * 40), 'partial': item} for i, item in enumerate(transcriptions)]
+    events.append({'progress': 100, 'message': 'Complete!', 'transcriptions': transcriptions,
+                   'video_title': 'Benchmark', 'source': 'captions'})
+    return events
+
+
+def serialize(events):
+    return sum(len(format_sse(event)) for event in events)
+
+
+def serialize_compact(events):
+    # One burst, as from the cache or the caption path in fast mode
+    compactor = CompactEvents(flush_interval=float('inf'))
+    out = []
+    for event in events:
+        out += compactor.add(event)
+    out += compactor.flush()
+    return sum(len(format_sse(event, compact=True)) for event in out)
+
+
+def serialize_gzip(events):
+    return sum(len(data) for data in sse_stream(iter(events), encoding='gzip'))
+
+
+def cases(workdir):
+    """Benchmarks for benchmarks/run.py"""
+    events = generate_events(2000)
+    return [
+        ('sse.format_2000_segments', lambda: serialize(events)),
+        ('sse.compact_2000_segments', lambda: serialize_compact(events)),
+        ('sse.gzip_2000_segments', lambda: serialize_gzip(events)),
+    ]
+
+
+def main():
+    events = generate_events(2000)
+    for name, fn in (('json', serialize), ('compact', serialize_compact), ('gzip', serialize_gzip)):
+        start = time.perf_counter()
+        size = fn(events)
+        print(f"{name:>8}: {(time.perf_counter() - start) * 1000:7.1f} ms, {size / 1024:8.1f} KB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+N.A.M.O.R. Video ID Benchmark
+Times extract_video_id() over a generated mix of YouTube URL forms
+
+Usage: python benchmarks/bench_video_id.py
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import extract_video_id
+
+URL_FORMS = [
+    'https://www.youtube.com/watch?v={id}',
+    'https://www.youtube.com/watch?v={id}&t=42s&list=PL1234567890',
+    'https://youtu.be/{id}',
+    'https://youtu.be/{id}?si=abcdefgh',
+    'https://www.youtube.com/embed/{id}?autoplay=1',
+    'https://m.youtube.com/watch?feature=share&v={id}',
+    'https://example.com/not/a/video/{id}',
+]
+ID_CHARS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_'
+
+
+def generate_urls(count, seed=25):
+    """Reproducible list of URLs in every supported (and one unsupported) form"""
+    rng = random.Random(seed)
+    return [rng.choice(URL_FORMS).format(id=''.join(rng.choice(ID_CHARS) for _ in range(11)))
+            for _ in range(count)]
+
+
+def extract_all(urls):
+    return [extract_video_id(url) for url in urls]
+
+
+def cases(workdir):
+    """Benchmarks for benchmarks/run.py"""
+    urls = generate_urls(10000)
+    return [('video_id.extract_10k', lambda: extract_all(urls))]
+
+
+def main():
+    urls = generate_urls(10000)
+    best = float('inf')
+    for _ in range(5):
+        start = time.perf_counter()
+        extract_all(urls)
+        best = min(best, time.perf_counter() - start)
+    print(f"extract_video_id: {len(urls)} URLs in {best * 1000:.1f} ms ({best / len(urls) * 1e6:.2f} µs per URL)")
+
+
+if __name__ == '__main__':
+    main()
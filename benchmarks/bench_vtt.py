@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+N.A.M.O.R. VTT Parser Benchmark
+Generates YouTube-style rolling auto-caption VTT files and times parse_vtt_file(),
+after checking that manual subtitles are parsed without de-duplication
+
+Usage: python benchmarks/bench_vtt.py [minutes ...]
+(benchmarks/run.py runs the 120-minute case as part of the suite)
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import find_caption_track, parse_vtt_file
+
+MANUAL_DIALOGUE = ['Are you coming?', 'No.', 'Really?', 'No.', 'No.']
+
+WORDS = ['the', 'lecture', 'today', 'covers', 'dynamic', 'programming', 'and', 'how',
+         'we', 'can', 'reuse', 'results', 'from', 'smaller', 'subproblems', 'to', 'solve']
+
+
+def vtt_time(seconds):
+    hours = int(seconds // 3600)
+    minutes = int(seconds % 3600 // 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds % 60:06.3f}"
+
+
+def write_rolling_vtt(path, minutes):
+    """Write a rolling auto-caption VTT: word timing tags plus 10 ms repeat cues"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('WEBVTT\nKind: captions\nLanguage: en\n\n')
+        previous = ''
+        t = 0.0
+        n = 0
+        while t < minutes * 60:
+            words = [WORDS[(n + i) % len(WORDS)] for i in range(6)]
+            tagged = words[0] + ''.join(
+                f"<{vtt_time(t + 0.3 * (i + 1))}><c> {w}</c>" for i, w in enumerate(words[1:])
+            )
+            f.write(f"{vtt_time(t)} --> {vtt_time(t + 2.5)} align:start position:0%\n{previous}\n{tagged}\n\n")
+            previous = ' '.join(words)
+            f.write(f"{vtt_time(t + 2.5)} --> {vtt_time(t + 2.51)} align:start position:0%\n{previous}\n \n\n")
+            t += 2.51
+            n += 1
+
+
+def write_manual_vtt(path, lines):
+    """Write a manual subtitle VTT with one cue per line, 2 s apart"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('WEBVTT\n\n')
+        for i, line in enumerate(lines):
+            f.write(f"{vtt_time(i * 2)} --> {vtt_time(i * 2 + 1.5)}\n{line}\n\n")
+
+
+def check_manual_subtitles(workdir):
+    """Repeated lines of a manual track are real dialogue: every cue must survive"""
+    path = os.path.join(workdir, 'manual.vtt')
+    write_manual_vtt(path, MANUAL_DIALOGUE)
+    info = {
+        'subtitles': {'en': [{'ext': 'vtt', 'url': 'https://example.com/manual.vtt'}]},
+        'automatic_captions': {'en': [{'ext': 'vtt', 'url': 'https://example.com/auto.vtt'}]},
+    }
+    url, automatic = find_caption_track(info, 'en')
+    assert (url, automatic) == ('https://example.com/manual.vtt', False), (url, automatic)
+    texts = [cue['text'] for cue in parse_vtt_file(path, segment_seconds=None, dedupe=automatic)]
+    assert texts == MANUAL_DIALOGUE, texts
+
+
+def bench(path, repeat=5, **kwargs):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = parse_vtt_file(path, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def cases(workdir):
+    """Benchmarks for benchmarks/run.py"""
+    check_manual_subtitles(workdir)
+    path = os.path.join(workdir, '120min.vtt')
+    write_rolling_vtt(path, 120)
+    return [
+        ('vtt.parse_rolling_120min', lambda: parse_vtt_file(path)),
+        ('vtt.parse_rolling_120min_cues', lambda: parse_vtt_file(path, segment_seconds=None)),
+    ]
+
+
+def main():
+    durations = [int(arg) for arg in sys.argv[1:]] or [30, 120, 360]
+
+    print("=" * 60)
+    print("N.A.M.O.R. - VTT Parser Benchmark")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        check_manual_subtitles(tmp)
+        print("✅ Manual subtitles keep repeated lines")
+        for minutes in durations:
+            path = os.path.join(tmp, f'{minutes}min.vtt')
+            write_rolling_vtt(path, minutes)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+
+            merged_time, merged = bench(path)
+            cue_time, cues = bench(path, segment_seconds=None)
+
+            print(f"{minutes:>4} min  {size_mb:6.2f} MB  "
+                  f"30s windows: {merged_time * 1000:8.1f} ms ({size_mb / merged_time:6.1f} MB/s, {len(merged)} segments)  "
+                  f"per cue: {cue_time * 1000:8.1f} ms ({len(cues)} cues)")
+
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
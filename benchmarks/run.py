@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+N.A.M.O.R. Benchmark Suite
+Runs every benchmarks/bench_*.py case on generated fixtures, records the
+results as JSON and compares them with a saved baseline.
+
+Usage:
+    python benchmarks/run.py                          run and print
+    python benchmarks/run.py --save                   also write benchmarks/baseline.json
+    python benchmarks/run.py --compare                fail if slower than benchmarks/baseline.json
+    python benchmarks/run.py -k vtt --repeat 10       only cases whose name contains "vtt"
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+MODULES = ['bench_vtt', 'bench_video_id', 'bench_audio', 'bench_sse']
+DEFAULT_REPEAT = 5
+DEFAULT_TOLERANCE = 0.25  # Slower than baseline by more than this fraction counts as a regression
+
+
+def time_case(fn, repeat):
+    """Run fn once to warm up, then repeat times; returns per-run seconds"""
+    fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run(pattern=None, repeat=DEFAULT_REPEAT):
+    """Generate fixtures and time every matching case"""
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        # The app creates its data folders in the working directory on import
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            sys.path.insert(0, BENCH_DIR)
+            for module_name in MODULES:
+                module = importlib.import_module(module_name)
+                for name, fn in module.cases(workdir):
+                    if pattern and pattern not in name:
+                        continue
+                    times = time_case(fn, repeat)
+                    results[name] = {
+                        'min': min(times),
+                        'median': statistics.median(times),
+                        'repeat': repeat,
+                    }
+                    print(f"{name:<36} min {min(times) * 1000:9.2f} ms   median {statistics.median(times) * 1000:9.2f} ms")
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print the change against the baseline per case; returns the names that regressed.
+
+    Compares best-of-N times, which are the least affected by noise.
+    """
+    regressions = []
+    print()
+    print(f"{'case':<36} {'baseline':>12} {'now':>12} {'change':>9}")
+    for name, result in results.items():
+        before = baseline.get('results', {}).get(name)
+        if before is None:
+            print(f"{name:<36} {'-':>12} {result['min'] * 1000:10.2f}ms {'new':>9}")
+            continue
+        change = result['min'] / before['min'] - 1
+        flag = ''
+        if change > tolerance:
+            regressions.append(name)
+            flag = '  ❌ slower'
+        elif change < -tolerance:
+            flag = '  ✅ faster'
+        print(f"{name:<36} {before['min'] * 1000:10.2f}ms {result['min'] * 1000:10.2f}ms {change:+8.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='N.A.M.O.R. benchmark suite')
+    parser.add_argument('-k', dest='pattern', help='only run cases whose name contains this')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='timed runs per case')
+    parser.add_argument('--save', nargs='?', const=BASELINE_PATH, help='write results as a baseline JSON')
+    parser.add_argument('--compare', nargs='?', const=BASELINE_PATH, help='compare with a baseline JSON')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed slowdown before a case counts as a regression (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("N.A.M.O.R. - Benchmark Suite")
+    print("=" * 60)
+
+    results = run(args.pattern, args.repeat)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\n💾 Saved {len(results)} results to {args.save}")
+
+    print("=" * 60)
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s) over {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""
+Resumable transcription checkpoints for N.A.M.O.R.
+Recognized chunks are appended to a log under a job key (video ID or upload
+content hash) as they finish, together with the downloaded audio. When a run
+is interrupted (e.g. by API rate limits) the next attempt replays the saved
+chunks and resumes decoding where the last finished chunk ended. A run holds
+an exclusive lease on its key, so concurrent runs of the same video or upload
+never write to (or clear) each other's checkpoint.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+
+
+class CheckpointStore:
+    """Per-key chunk logs and audio files on disk, shared by every worker process"""
+
+    def __init__(self, folder, retention_seconds=7 * 24 * 3600):
+        self.folder = folder
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self._held = set()  # Keys leased by this process
+
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+    def _dir(self, key):
+        # Keys come from request data: never let one name a path outside the folder
+        if not key or key in ('.', '..') or os.path.basename(key) != key or (os.altsep and os.altsep in key):
+            raise ValueError(f'Invalid checkpoint key: {key!r}')
+        return os.path.join(self.folder, key)
+
+    def _meta_path(self, key):
+        return os.path.join(self._dir(key), 'meta.json')
+
+    def _lease_path(self, key):
+        # Next to the checkpoint directory, so clear() doesn't remove it
+        return self._dir(key) + '.lock'
+
+    def _lease_is_stale(self, key):
+        """True if the key's lease file was left behind by a process that no longer runs"""
+        try:
+            with open(self._lease_path(key), 'r', encoding='utf-8') as f:
+                pid = int(f.read())
+        except FileNotFoundError:
+            return True
+        except (OSError, ValueError):
+            # Still being written by its owner
+            return False
+        if pid == os.getpid():
+            # An earlier process with the same PID (e.g. after a container restart)
+            return key not in self._held
+        if os.name != 'posix':
+            # os.kill(pid, 0) would terminate the process on Windows
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            pass
+        return False
+
+    def _acquire(self, key):
+        """Take the exclusive lease on a key; False while another run holds it"""
+        with self._lock:
+            for _ in range(2):
+                try:
+                    fd = os.open(self._lease_path(key), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                except FileExistsError:
+                    if not self._lease_is_stale(key):
+                        return False
+                    try:
+                        os.remove(self._lease_path(key))
+                    except FileNotFoundError:
+                        pass
+                    continue
+                self._held.add(key)
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(str(os.getpid()))
+                return True
+            return False
+
+    def release(self, key):
+        """Give up the lease taken by open(); the checkpoint itself stays for a retry"""
+        with self._lock:
+            if key not in self._held:
+                return
+            self._held.discard(key)
+            try:
+                os.remove(self._lease_path(key))
+            except FileNotFoundError:
+                pass
+
+    def _read_meta(self, key):
+        try:
+            with open(self._meta_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, key, meta):
+        tmp_path = self._meta_path(key) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._meta_path(key))
+
+    def open(self, key, params):
+        """Lease, start or resume a checkpoint and return its finished chunks in order.
+
+        Chunks are dicts with 'start', 'end' and 'text'. A checkpoint recorded
+        with different params (language, engine, ...) is discarded. Returns
+        None, and touches nothing, while another run holds the key; otherwise
+        the caller must release() it when done.
+        """
+        self.cleanup()
+        if not self._acquire(key):
+            return None
+
+        meta = self._read_meta(key)
+        if meta is not None and meta.get('params') != params:
+            self.clear(key)
+            meta = None
+        if meta is None:
+            os.makedirs(self._dir(key), exist_ok=True)
+            meta = {'params': params, 'audio': None}
+        meta['updated_at'] = time.time()
+        self._write_meta(key, meta)
+
+        chunks = []
+        try:
+            with open(os.path.join(self._dir(key), 'chunks.jsonl'), 'r', encoding='utf-8') as f:
+                for line in f:
+                    # A crash can leave the last line half-written
+                    if not line.endswith('\n'):
+                        break
+                    chunks.append(json.loads(line))
+        except OSError:
+            pass
+        return chunks
+
+    def append(self, key, start, end, text):
+        """Record one finished chunk"""
+        with open(os.path.join(self._dir(key), 'chunks.jsonl'), 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'start': start, 'end': end, 'text': text}) + '\n')
+
+    def audio_path(self, key):
+        """Path of the checkpointed audio file, or None if none was kept"""
+        meta = self._read_meta(key) or {}
+        path = meta.get('audio') and os.path.join(self._dir(key), meta['audio'])
+        return path if path and os.path.exists(path) else None
+
+    def keep_audio(self, key, path):
+        """Move a downloaded audio file into the checkpoint and return its new path"""
+        meta = self._read_meta(key) or {}
+        name = 'audio' + os.path.splitext(path)[1]
+        new_path = os.path.join(self._dir(key), name)
+        shutil.move(path, new_path)
+        meta['audio'] = name
+        self._write_meta(key, meta)
+        return new_path
+
+    def clear(self, key):
+        """Drop a leased checkpoint once its transcript is complete"""
+        shutil.rmtree(self._dir(key), ignore_errors=True)
+
+    def cleanup(self):
+        """Remove checkpoints that have not been resumed within the retention period"""
+        cutoff = time.time() - self.retention_seconds
+        for key in os.listdir(self.folder):
+            if key.endswith('.lock'):
+                continue
+            if os.path.exists(self._lease_path(key)) and not self._lease_is_stale(key):
+                # In use by a running transcription
+                continue
+            meta = self._read_meta(key)
+            try:
+                updated_at = meta['updated_at'] if meta else os.path.getmtime(self._dir(key))
+            except (KeyError, OSError):
+                updated_at = 0
+            if updated_at < cutoff:
+                shutil.rmtree(self._dir(key), ignore_errors=True)
@@ -0,0 +1,295 @@
+"""
+Background transcription jobs for N.A.M.O.R.
+Jobs run in a process pool, independent of the HTTP request that submitted
+them. Every progress event is appended to the job's event log on disk, so
+clients can disconnect, reconnect and replay the stream from any point.
+"""
+
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import metrics
+
+FINISHED_STATES = ('done', 'failed')
+
+_in_job_worker = False
+
+
+def _init_job_worker():
+    global _in_job_worker
+    _in_job_worker = True
+
+
+def in_job_worker():
+    """True inside a job worker process"""
+    return _in_job_worker
+
+
+def _write_json(path, data):
+    # Write-then-rename so readers never see a half-written file
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def run_job(job_dir, events_fn, kwargs, metrics_folder=None):
+    """Worker entry point: run an event generator and append each event to the job log"""
+    state_path = os.path.join(job_dir, 'state.json')
+    state = _read_json(state_path) or {}
+    state.update(state='running', started_at=time.time())
+    _write_json(state_path, state)
+
+    final_state = 'done'
+    with open(os.path.join(job_dir, 'events.jsonl'), 'a', encoding='utf-8') as log:
+        try:
+            for event in events_fn(**kwargs):
+                log.write(json.dumps(event) + '\n')
+                log.flush()
+                if event.get('error'):
+                    final_state = 'failed'
+        except Exception as e:
+            log.write(json.dumps({'progress': 100, 'error': f'Error: {str(e)}'}) + '\n')
+            final_state = 'failed'
+
+    state.update(state=final_state, finished_at=time.time())
+    _write_json(state_path, state)
+
+    # Worker metrics live in this process, hand the totals to the server's /metrics
+    if metrics_folder:
+        metrics.write_snapshot(metrics_folder)
+
+
+class JobManager:
+    """Submits jobs to a process pool and reads back their state and event logs"""
+
+    def __init__(self, jobs_folder, workers=None, retention_seconds=24 * 3600, metrics_folder=None):
+        self.jobs_folder = jobs_folder
+        self.workers = workers or os.cpu_count() or 1
+        self.retention_seconds = retention_seconds
+        self.metrics_folder = metrics_folder
+        self._executor = None
+        self._executor_lock = threading.Lock()  # Request threads (and batch threads) submit concurrently
+
+        if not os.path.exists(jobs_folder):
+            os.makedirs(jobs_folder)
+
+    @property
+    def executor(self):
+        # Created on first use so importing the app never starts workers. Spawned
+        # rather than forked: the server process has threads and open connections.
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_job_worker
+                )
+            return self._executor
+
+    def _submit_to_pool(self, *args):
+        """Submit to the worker pool, replacing the pool if a dead worker has broken it"""
+        executor = self.executor
+        try:
+            return executor.submit(*args)
+        except BrokenProcessPool:
+            # A worker was killed (OOM, crash in a native library); the pool takes no more work
+            with self._executor_lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False)
+            return self.executor.submit(*args)
+
+    def job_dir(self, job_id):
+        return os.path.join(self.jobs_folder, job_id)
+
+    def exists(self, job_id):
+        return os.path.exists(os.path.join(self.job_dir(job_id), 'state.json'))
+
+    def submit(self, kind, events_fn, **kwargs):
+        """Queue events_fn(**kwargs) on the worker pool and return the new job ID"""
+        self.cleanup()
+
+        job_id = uuid.uuid4().hex
+        job_dir = self.job_dir(job_id)
+        os.makedirs(job_dir)
+        open(os.path.join(job_dir, 'events.jsonl'), 'w').close()
+        _write_json(os.path.join(job_dir, 'state.json'), {
+            'job_id': job_id,
+            'kind': kind,
+            'state': 'queued',
+            'created_at': time.time(),
+        })
+
+        try:
+            future = self._submit_to_pool(run_job, job_dir, events_fn, kwargs, self.metrics_folder)
+        except Exception as e:
+            # Never leave a job queued that no worker will pick up
+            self._mark_failed(job_dir, f'Could not start job: {str(e)}')
+            raise
+        future.add_done_callback(lambda f: self._on_done(job_dir, f))
+        return job_id
+
+    def _on_done(self, job_dir, future):
+        # A worker that crashed (or a broken pool) never reports back, so record it here
+        if future.exception() is None:
+            return
+        self._mark_failed(job_dir, f'Worker failed: {future.exception()}')
+
+    def _mark_failed(self, job_dir, error):
+        state_path = os.path.join(job_dir, 'state.json')
+        state = _read_json(state_path) or {}
+        if state.get('state') in FINISHED_STATES:
+            return
+        with open(os.path.join(job_dir, 'events.jsonl'), 'a', encoding='utf-8') as log:
+            log.write(json.dumps({'progress': 100, 'error': error}) + '\n')
+        state.update(state='failed', finished_at=time.time())
+        _write_json(state_path, state)
+
+    def status(self, job_id):
+        """Return the job state plus its most recent event, or None for unknown jobs"""
+        job_dir = self.job_dir(job_id)
+        state = _read_json(os.path.join(job_dir, 'state.json'))
+        if state is None:
+            return None
+
+        last_event = None
+        count = 0
+        for _, event in self._read_events(job_dir, 0):
+            last_event = event
+            count += 1
+        state['events'] = count
+        state['last_event'] = last_event
+        return state
+
+    def poll_events(self, job_id, position=0, seq=0):
+        """Read the events appended to a job log since a byte position, without waiting.
+
+        Returns (events, position, seq, finished): the new (sequence, event)
+        pairs, where to continue reading, the last sequence number seen, and
+        whether the job has finished with every event read.
+        """
+        job_dir = self.job_dir(job_id)
+        # Read the state before the log so no event written before "finished" is missed
+        state = _read_json(os.path.join(job_dir, 'state.json')) or {}
+        events = []
+        with open(os.path.join(job_dir, 'events.jsonl'), 'rb') as log:
+            log.seek(position)
+            while True:
+                line = log.readline()
+                if not line.endswith(b'\n'):
+                    # Nothing new, or a worker is mid-write on this line
+                    break
+                position += len(line)
+                seq += 1
+                events.append((seq, json.loads(line)))
+        return events, position, seq, state.get('state') in FINISHED_STATES
+
+    def events(self, job_id, after=0, poll_interval=0.25):
+        """Yield (sequence, event) from the job log after the given sequence number.
+
+        Keeps following the log until the job has finished and every event has
+        been delivered.
+        """
+        position = seq = 0
+        while True:
+            events, position, seq, finished = self.poll_events(job_id, position, seq)
+            for event_seq, event in events:
+                if event_seq > after:
+                    yield event_seq, event
+            if finished:
+                return
+            time.sleep(poll_interval)
+
+    def _read_events(self, job_dir, after):
+        # Only complete lines count, a worker may be mid-write on the last one
+        try:
+            with open(os.path.join(job_dir, 'events.jsonl'), 'r', encoding='utf-8') as f:
+                for seq, line in enumerate(f, 1):
+                    if not line.endswith('\n'):
+                        break
+                    if seq > after:
+                        yield seq, json.loads(line)
+        except OSError:
+            return
+
+    def cleanup(self):
+        """Remove finished jobs older than the retention period"""
+        cutoff = time.time() - self.retention_seconds
+        for job_id in os.listdir(self.jobs_folder):
+            state = _read_json(os.path.join(self.job_dir(job_id), 'state.json'))
+            if state and state.get('state') in FINISHED_STATES and state.get('finished_at', 0) < cutoff:
+                shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+
+
+class SharedEvents:
+    """Runs one event generator per key and fans its events out to every concurrent caller.
+
+    The generator runs in a background thread, so it keeps going (and
+    finishes for the other callers) when the client that started it leaves.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._runs = {}
+
+    def events(self, key, events_fn, on_join=None):
+        """Follow the run for key, starting events_fn() if none is in flight.
+
+        When an in-flight run is followed instead, on_join() is called, e.g.
+        to drop the caller's own copy of the run's input.
+        """
+        with self._lock:
+            run = self._runs.get(key)
+            joined = run is not None
+            if run is None:
+                run = {'events': [], 'done': False, 'cond': threading.Condition()}
+                self._runs[key] = run
+                threading.Thread(target=self._produce, args=(key, run, events_fn), daemon=True).start()
+        if joined and on_join:
+            on_join()
+        return self._follow(run)
+
+    def _produce(self, key, run, events_fn):
+        try:
+            for event in events_fn():
+                with run['cond']:
+                    run['events'].append(event)
+                    run['cond'].notify_all()
+        except Exception as e:
+            with run['cond']:
+                run['events'].append({'progress': 100, 'error': f'Error: {str(e)}'})
+        finally:
+            with self._lock:
+                self._runs.pop(key, None)
+            with run['cond']:
+                run['done'] = True
+                run['cond'].notify_all()
+
+    def _follow(self, run):
+        seen = 0
+        while True:
+            with run['cond']:
+                while seen == len(run['events']) and not run['done']:
+                    run['cond'].wait()
+                batch = run['events'][seen:]
+                finished = run['done']
+            seen += len(batch)
+            yield from batch
+            if finished:
+                return
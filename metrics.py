@@ -0,0 +1,174 @@
+"""
+Timing and throughput metrics for N.A.M.O.R.
+Counters and latency histograms kept in memory per process and rendered in
+the Prometheus text format. Worker processes (background jobs) write their
+totals to snapshot files, which the serving process merges into /metrics.
+"""
+
+import functools
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers a fast cache hit up to a multi-minute download
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+METRICS = {
+    'namor_requests_total': ('counter', 'Transcription requests by kind'),
+    'namor_stage_seconds': ('histogram', 'Time spent in each pipeline stage'),
+    'namor_first_partial_seconds': ('histogram', 'Time from request start to the first partial result'),
+    'namor_recognizer_seconds': ('histogram', 'Recognizer round trip per chunk'),
+    'namor_recognizer_errors_total': ('counter', 'Recognizer failures by engine and error type'),
+    'namor_chunks_total': ('counter', 'Speech chunks sent to the recognizer'),
+    'namor_audio_bytes_total': ('counter', 'PCM bytes sent to the recognizer'),
+    'namor_caption_bytes_total': ('counter', 'Caption track bytes downloaded'),
+    'namor_cache_requests_total': ('counter', 'Transcript cache lookups by result (hit or miss)'),
+}
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts, sum, count]
+
+
+def _key(name, labels):
+    if name not in METRICS:
+        raise KeyError(f'Unknown metric: {name}')
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, value=1, **labels):
+    """Add value to a counter"""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    """Record one observation (usually seconds) in a histogram"""
+    key = _key(name, labels)
+    with _lock:
+        entry = _histograms.get(key)
+        if entry is None:
+            entry = _histograms[key] = [[0] * len(DEFAULT_BUCKETS), 0.0, 0]
+        for i, bound in enumerate(DEFAULT_BUCKETS):
+            if value <= bound:
+                entry[0][i] += 1
+        entry[1] += value
+        entry[2] += 1
+
+
+@contextmanager
+def span(stage, **labels):
+    """Time a block as one pipeline stage, also when it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe('namor_stage_seconds', time.perf_counter() - start, stage=stage, **labels)
+
+
+def instrument_events(kind):
+    """Decorate an event generator to record its total time (stage 'request') and time to first partial"""
+    def decorator(events_fn):
+        @functools.wraps(events_fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            first_partial = True
+            with span('request', kind=kind):
+                for event in events_fn(*args, **kwargs):
+                    if first_partial and ('partial' in event or 'partial_text' in event):
+                        observe('namor_first_partial_seconds', time.perf_counter() - start, kind=kind)
+                        first_partial = False
+                    yield event
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    """Copy of this process's metrics as JSON-serializable lists"""
+    with _lock:
+        return {
+            'counters': [[name, dict(labels), value] for (name, labels), value in _counters.items()],
+            'histograms': [[name, dict(labels), list(buckets), total, count]
+                           for (name, labels), (buckets, total, count) in _histograms.items()],
+        }
+
+
+def write_snapshot(folder):
+    """Save this process's totals as <folder>/<pid>.json for the serving process to merge"""
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f'{os.getpid()}.json')
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+def clear_snapshots(folder):
+    """Forget worker totals from a previous server run"""
+    for path in glob.glob(os.path.join(folder, '*.json')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, **extra):
+    items = list(labels.items()) + list(extra.items())
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items) + '}'
+
+
+def render(snapshot_folder=None):
+    """Prometheus text exposition of this process plus any worker snapshots"""
+    snapshots = [snapshot()]
+    if snapshot_folder:
+        for path in glob.glob(os.path.join(snapshot_folder, '*.json')):
+            if os.path.basename(path) == f'{os.getpid()}.json':
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+
+    counters = {}
+    histograms = {}
+    for snap in snapshots:
+        for name, labels, value in snap.get('counters', []):
+            key = (name, tuple(sorted(labels.items())))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, buckets, total, count in snap.get('histograms', []):
+            key = (name, tuple(sorted(labels.items())))
+            entry = histograms.setdefault(key, [[0] * len(DEFAULT_BUCKETS), 0.0, 0])
+            entry[0] = [a + b for a, b in zip(entry[0], buckets)]
+            entry[1] += total
+            entry[2] += count
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(dict(labels))} {value}')
+        else:
+            for (metric, labels), (buckets, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                labels = dict(labels)
+                for bound, bucket_count in zip(DEFAULT_BUCKETS, buckets):
+                    lines.append(f'{name}_bucket{_format_labels(labels, le=bound)} {bucket_count}')
+                lines.append(f'{name}_bucket{_format_labels(labels, le="+Inf")} {count}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+                lines.append(f'{name}_count{_format_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
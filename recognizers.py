@@ -0,0 +1,88 @@
+"""
+Speech recognition backends for N.A.M.O.R.
+Every backend takes an sr.AudioData chunk and returns the recognized text
+('' when nothing was understood). Remote backends raise sr.RequestError on
+API failures. Local backends run on the CPU and are safe to call from a
+process pool, so they scale across all cores without any network access.
+"""
+
+import importlib.util
+import json
+import os
+import time
+
+import speech_recognition as sr
+
+VOSK_MODEL_PATH = os.environ.get('VOSK_MODEL_PATH', 'model')  # Unpacked model from alphacephei.com/vosk/models
+VOSK_SAMPLE_RATE = 16000
+
+# Loaded once per process, a Vosk model takes seconds to load
+_vosk_model = None
+
+
+def recognize_google(audio_data, language='en-US'):
+    """Google Web Speech API (remote, free tier, rate limited)"""
+    try:
+        return sr.Recognizer().recognize_google(audio_data, language=language)
+    except sr.UnknownValueError:
+        return ''
+
+
+def recognize_sphinx(audio_data, language='en-US'):
+    """CMU PocketSphinx (local, CPU only)"""
+    try:
+        return sr.Recognizer().recognize_sphinx(audio_data, language=language)
+    except sr.UnknownValueError:
+        return ''
+
+
+def recognize_vosk(audio_data, language='en-US'):
+    """Vosk/Kaldi (local, CPU only). The language is fixed by the model at VOSK_MODEL_PATH."""
+    global _vosk_model
+    from vosk import Model, KaldiRecognizer
+
+    if _vosk_model is None:
+        _vosk_model = Model(VOSK_MODEL_PATH)
+
+    recognizer = KaldiRecognizer(_vosk_model, VOSK_SAMPLE_RATE)
+    recognizer.AcceptWaveform(audio_data.get_raw_data(convert_rate=VOSK_SAMPLE_RATE, convert_width=2))
+    return json.loads(recognizer.FinalResult()).get('text', '')
+
+
+BACKENDS = {
+    'google': {'recognize': recognize_google, 'local': False},
+    'sphinx': {'recognize': recognize_sphinx, 'local': True},
+    'vosk': {'recognize': recognize_vosk, 'local': True},
+}
+
+
+def is_local(name):
+    """True for backends that run on this machine's CPU (and belong in a process pool)"""
+    return BACKENDS[name]['local']
+
+
+def is_available(name):
+    """True when the backend is known and its optional dependencies are installed"""
+    if name not in BACKENDS:
+        return False
+    if name == 'sphinx':
+        return importlib.util.find_spec('pocketsphinx') is not None
+    if name == 'vosk':
+        return importlib.util.find_spec('vosk') is not None and os.path.isdir(VOSK_MODEL_PATH)
+    return True
+
+
+def available_backends():
+    return [name for name in BACKENDS if is_available(name)]
+
+
+def recognize(name, audio_data, language='en-US'):
+    """Recognize one chunk with the named backend"""
+    return BACKENDS[name]['recognize'](audio_data, language)
+
+
+def recognize_timed(name, audio_data, language='en-US'):
+    """recognize() plus the seconds it took, for callers timing work done in another process"""
+    start = time.perf_counter()
+    text = recognize(name, audio_data, language)
+    return text, time.perf_counter() - start
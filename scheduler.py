@@ -0,0 +1,221 @@
+"""
+Rate-limit-aware scheduling of remote recognizer calls for N.A.M.O.R.
+One scheduler per remote backend is shared by every request in the
+process. It limits calls per second with a token bucket, adapts the
+number of concurrent calls AIMD-style (grow slowly on success, halve on an
+API error), retries with jittered exponential backoff and stops calling a
+backend that keeps failing (circuit breaker) until it has cooled down.
+The token bucket can live in SQLite, so the server and its job worker
+processes share one rate budget.
+"""
+
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import speech_recognition as sr
+
+import metrics
+
+
+class CircuitOpenError(sr.RequestError):
+    """Raised without calling the backend while its circuit breaker is open"""
+
+
+class TokenBucket:
+    """Calls per second within one process"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def take(self):
+        """Take a token if there is one; returns 0, or the seconds until one is available"""
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / self.rate
+
+    def available(self):
+        self._refill()
+        return self._tokens
+
+
+class SharedTokenBucket:
+    """Token bucket stored in SQLite, shared by every process that opens the same file"""
+
+    def __init__(self, db_path, name, rate, burst):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        # Autocommit, transactions are opened explicitly
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, '
+                           'refilled_at REAL NOT NULL)')
+
+    def _update(self, take):
+        # Wall-clock time: the refill point is compared across processes
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                now = time.time()
+                row = self._conn.execute('SELECT tokens, refilled_at FROM buckets WHERE name = ?',
+                                         (self.name,)).fetchone()
+                tokens, refilled_at = row if row else (float(self.burst), now)
+                tokens = min(self.burst, tokens + max(0.0, now - refilled_at) * self.rate)
+                wait = 0
+                if take:
+                    if tokens >= 1:
+                        tokens -= 1
+                    else:
+                        wait = (1 - tokens) / self.rate
+                self._conn.execute('INSERT OR REPLACE INTO buckets (name, tokens, refilled_at) VALUES (?, ?, ?)',
+                                   (self.name, tokens, now))
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        return tokens, wait
+
+    def take(self):
+        """Take a token if there is one; returns 0, or the seconds until one is available"""
+        return self._update(take=True)[1]
+
+    def available(self):
+        return self._update(take=False)[0]
+
+
+class RecognizerScheduler:
+    """Admission control, retries and circuit breaking for one remote backend"""
+
+    def __init__(self, name, rate=5.0, burst=10, initial_limit=4, max_limit=16, retries=3,
+                 backoff=1.0, max_backoff=30.0, failure_threshold=5, cooldown=30.0, bucket=None):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_limit = max_limit
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+        self._cond = threading.Condition()
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._bucket = bucket or TokenBucket(rate, burst)
+        self._failures = 0        # Consecutive API errors (one per back-off)
+        self._epoch = 0           # Bumped on every back-off; earlier calls' errors don't count again
+        self._opened_at = None    # Set while the circuit is open
+        self._probing = False     # A half-open trial call is in flight
+
+    def _acquire(self):
+        """Wait for a concurrency slot and a token.
+
+        Returns (probe, epoch): whether this is the half-open trial call, and
+        the back-off epoch the call started in.
+        """
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                probe = False
+                if self._opened_at is not None:
+                    if self._probing or now - self._opened_at < self.cooldown:
+                        raise CircuitOpenError(f'{self.name} recognizer paused after repeated API errors')
+                    # Cooled down: let exactly one call through to test the backend
+                    probe = True
+
+                wait = None
+                if self._in_flight < int(self._limit):
+                    wait = self._bucket.take()
+                    if not wait:
+                        self._in_flight += 1
+                        if probe:
+                            self._probing = True
+                        return probe, self._epoch
+                self._cond.wait(wait)
+
+    def _release(self, probe, epoch, ok):
+        """Return the slot and adapt to the outcome (ok=None leaves the limits alone)"""
+        with self._cond:
+            self._in_flight -= 1
+            if probe:
+                self._probing = False
+            if ok:
+                # Additive increase: about one more slot per limit's worth of successes
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+                self._failures = 0
+                self._opened_at = None
+            elif ok is not None and (probe or epoch == self._epoch):
+                # Multiplicative decrease, once per overload: calls already in flight when
+                # the limit was cut were admitted under the old limit. After too many
+                # back-offs in a row, stop calling.
+                self._limit = max(1.0, self._limit / 2)
+                self._epoch += 1
+                self._failures += 1
+                if probe or self._failures >= self.failure_threshold:
+                    self._opened_at = time.monotonic()
+            self._cond.notify_all()
+
+    def _sleep_before_retry(self, attempt):
+        # Full jitter, so clients that failed together don't retry together
+        time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt))))
+
+    def call(self, fn, *args):
+        """Run fn(*args) under the scheduler, retrying sr.RequestError with jittered backoff"""
+        for attempt in range(self.retries + 1):
+            try:
+                probe, epoch = self._acquire()
+            except CircuitOpenError:
+                metrics.inc('namor_recognizer_errors_total', engine=self.name, error='circuit_open')
+                raise
+            start = time.perf_counter()
+            try:
+                result = fn(*args)
+            except sr.RequestError:
+                self._release(probe, epoch, False)
+                metrics.inc('namor_recognizer_errors_total', engine=self.name, error='request')
+                if attempt == self.retries:
+                    raise
+                self._sleep_before_retry(attempt)
+                continue
+            except BaseException:
+                self._release(probe, epoch, None)
+                raise
+            finally:
+                metrics.observe('namor_recognizer_seconds', time.perf_counter() - start, engine=self.name)
+            self._release(probe, epoch, True)
+            return result
+
+    def state(self):
+        """Current limits for health checks"""
+        with self._cond:
+            if self._opened_at is None:
+                circuit = 'closed'
+            elif self._probing or time.monotonic() - self._opened_at < self.cooldown:
+                circuit = 'open'
+            else:
+                circuit = 'half-open'
+            return {
+                'concurrency_limit': int(self._limit),
+                'in_flight': self._in_flight,
+                'tokens': round(self._bucket.available(), 2),
+                'consecutive_failures': self._failures,
+                'circuit': circuit,
+            }
@@ -0,0 +1,150 @@
+"""
+Full-text search over finished transcripts for N.A.M.O.R.
+Every segment of a transcript is stored with its video ID and timestamp in
+SQLite and indexed with FTS5, so phrases can be found across all transcribed
+videos and answered with the segment time to jump to. Unlike the transcript
+cache, the index never expires entries; a new transcript of the same video
+and language replaces the old one.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+
+QUERY_TOKEN_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def parse_segment_time(value):
+    """Seconds from a segment's 'MM:SS' (or 'HH:MM:SS') time"""
+    seconds = 0.0
+    for part in str(value).split(':'):
+        try:
+            seconds = seconds * 60 + float(part)
+        except ValueError:
+            return 0.0
+    return seconds
+
+
+def fts_query(text):
+    """Turn a user query into an FTS5 expression that never raises a syntax error.
+
+    Words must all match (in any order), "quoted phrases" must match as
+    phrases, and a trailing * makes a word a prefix search.
+    """
+    terms = []
+    for phrase, word in QUERY_TOKEN_RE.findall(text):
+        term = phrase if phrase else word
+        prefix = not phrase and term.endswith('*')
+        term = term.rstrip('*') if prefix else term
+        if not term.strip():
+            continue
+        terms.append('"' + term.replace('"', '""') + '"' + (' *' if prefix else ''))
+    return ' '.join(terms)
+
+
+class SearchIndex:
+    """SQLite FTS5 index of transcript segments, safe to share between request threads"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS documents (
+                video_id TEXT NOT NULL,
+                language TEXT NOT NULL,
+                source TEXT NOT NULL,
+                video_title TEXT,
+                indexed_at REAL NOT NULL,
+                PRIMARY KEY (video_id, language)
+            );
+            CREATE TABLE IF NOT EXISTS segments (
+                id INTEGER PRIMARY KEY,
+                video_id TEXT NOT NULL,
+                language TEXT NOT NULL,
+                time TEXT NOT NULL,
+                seconds REAL NOT NULL,
+                text TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_segments_video ON segments (video_id, language);
+
+            -- External-content FTS table: the text is stored once, in segments
+            CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+                text, content='segments', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+            );
+            CREATE TRIGGER IF NOT EXISTS segments_ai AFTER INSERT ON segments BEGIN
+                INSERT INTO segments_fts (rowid, text) VALUES (new.id, new.text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS segments_ad AFTER DELETE ON segments BEGIN
+                INSERT INTO segments_fts (segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+            END;
+        ''')
+        self._conn.commit()
+
+    def add(self, video_id, language, source, video_title, transcriptions):
+        """Index a finished transcript ({'time', 'text'} segments), replacing any earlier one"""
+        rows = [(video_id, language, item['time'], parse_segment_time(item['time']), item['text'])
+                for item in transcriptions if item.get('text', '').strip()]
+        with self._lock:
+            with self._conn:
+                self._conn.execute('DELETE FROM segments WHERE video_id = ? AND language = ?', (video_id, language))
+                self._conn.executemany(
+                    'INSERT INTO segments (video_id, language, time, seconds, text) VALUES (?, ?, ?, ?, ?)', rows
+                )
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO documents (video_id, language, source, video_title, indexed_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (video_id, language, source, video_title, time.time())
+                )
+
+    def search(self, query, limit=20, language=None, video_id=None):
+        """Best-matching segments for a query, as dicts with video and time.
+
+        'snippet' is the segment text around the match, with matched terms
+        wrapped in ** markers.
+        """
+        expression = fts_query(query)
+        if not expression:
+            return []
+
+        sql = ('SELECT s.video_id, d.video_title, s.language, d.source, s.time, s.seconds, '
+               "snippet(segments_fts, 0, '**', '**', '…', 16) "
+               'FROM segments_fts JOIN segments s ON s.id = segments_fts.rowid '
+               'JOIN documents d ON d.video_id = s.video_id AND d.language = s.language '
+               'WHERE segments_fts MATCH ?')
+        params = [expression]
+        if language:
+            sql += ' AND s.language = ?'
+            params.append(language)
+        if video_id:
+            sql += ' AND s.video_id = ?'
+            params.append(video_id)
+        sql += ' ORDER BY rank LIMIT ?'
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [{
+            'video_id': row[0],
+            'video_title': row[1],
+            'language': row[2],
+            'source': row[3],
+            'time': row[4],
+            'seconds': row[5],
+            'snippet': row[6],
+        } for row in rows]
+
+    def stats(self):
+        """Number of indexed transcripts and segments"""
+        with self._lock:
+            documents = self._conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+            segments = self._conn.execute('SELECT COUNT(*) FROM segments').fetchone()[0]
+        return {'transcripts': documents, 'segments': segments}
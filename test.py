@@ -45,8 +45,8 @@ required_modules = [
     'flask',
     'flask_cors',
     'speech_recognition',
-    'pydub',
-    'yt_dlp'
+    'yt_dlp',
+    'numpy'
 ]
 
 all_modules_installed = True
@@ -0,0 +1,115 @@
+"""
+Persistent transcript cache for N.A.M.O.R.
+Stores finished transcripts in SQLite keyed by video ID, language and source,
+with a TTL and least-recently-used eviction once the cache grows too large.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class TranscriptCache:
+    """SQLite-backed transcript cache, safe to share between request threads"""
+
+    def __init__(self, db_path, ttl_seconds=7 * 24 * 3600, max_bytes=200 * 1024 * 1024):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS transcripts (
+                video_id TEXT NOT NULL,
+                language TEXT NOT NULL,
+                source TEXT NOT NULL,
+                video_title TEXT,
+                payload TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (video_id, language, source)
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_transcripts_accessed ON transcripts (accessed_at)')
+        self._conn.commit()
+
+    def get(self, video_id, language, sources=('captions', 'audio')):
+        """Return the first cached entry found for the given sources, or None.
+
+        Entries are dicts with 'video_title', 'source' and 'transcriptions'.
+        """
+        now = time.time()
+        with self._lock:
+            for source in sources:
+                row = self._conn.execute(
+                    'SELECT video_title, payload, created_at FROM transcripts '
+                    'WHERE video_id = ? AND language = ? AND source = ?',
+                    (video_id, language, source)
+                ).fetchone()
+                if row is None:
+                    continue
+
+                video_title, payload, created_at = row
+                if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                    self._conn.execute(
+                        'DELETE FROM transcripts WHERE video_id = ? AND language = ? AND source = ?',
+                        (video_id, language, source)
+                    )
+                    self._conn.commit()
+                    continue
+
+                self._conn.execute(
+                    'UPDATE transcripts SET accessed_at = ? WHERE video_id = ? AND language = ? AND source = ?',
+                    (now, video_id, language, source)
+                )
+                self._conn.commit()
+                return {
+                    'video_title': video_title,
+                    'source': source,
+                    'transcriptions': json.loads(payload)
+                }
+        return None
+
+    def put(self, video_id, language, source, video_title, transcriptions):
+        """Store a finished transcript and evict old entries if needed"""
+        payload = json.dumps(transcriptions)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO transcripts '
+                '(video_id, language, source, video_title, payload, size, created_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (video_id, language, source, video_title, payload, len(payload), now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        # Drop expired entries first, then least recently used ones until under max_bytes
+        if self.ttl_seconds:
+            self._conn.execute('DELETE FROM transcripts WHERE created_at < ?', (now - self.ttl_seconds,))
+
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM transcripts').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute(
+            'SELECT video_id, language, source, size FROM transcripts ORDER BY accessed_at'
+        ).fetchall()
+        for video_id, language, source, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute(
+                'DELETE FROM transcripts WHERE video_id = ? AND language = ? AND source = ?',
+                (video_id, language, source)
+            )
+            total -= size